@@ -0,0 +1,88 @@
+"""
+Benchmarks gzip, parallel gzip and zstd on JSON payloads like those written by
+filesystem_put, reporting the compressed size and the compression and
+decompression throughput of each codec. Requires the zstandard package.
+
+    python benchmarks/compression.py [rows]
+"""
+
+import json
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from prefect_filesystem.abstract_local_filesystem import AbstractLocalFileSystem
+
+codecs = [
+    "gzip",
+    dict(type="pigz"),
+    dict(type="zstd", level=1),
+    dict(type="zstd"),
+    dict(type="zstd", level=9, threads=-1),
+    dict(type="zstd", level=19, threads=-1, long=True),
+]
+
+
+def _payload(rows):
+    """
+    JSON array of rows records with repeated keys and varied values
+    :param rows:
+    :return:
+    """
+    return json.dumps(
+        [
+            dict(
+                id=n,
+                name=f"customer {n}",
+                token=os.urandom(6).hex(),
+                amount=n * 37 % 10007 / 100,
+                tags=["a", "b", "c"][: n % 4],
+            )
+            for n in range(rows)
+        ]
+    ).encode()
+
+
+def _timed(block, tmp, compression, data):
+    """
+    Writes and reads back data, returning the stored size and seconds taken
+    for each direction
+    :param block:
+    :param tmp:
+    :param compression:
+    :param data:
+    :return:
+    """
+    started = time.monotonic()
+    with block.open("payload", "wb", compression=compression) as fd:
+        fd.write(data)
+    written = time.monotonic()
+    with block.open("payload", "rb", compression=compression) as fd:
+        assert fd.read() == data
+    read = time.monotonic()
+    size = os.path.getsize(os.path.join(tmp, "payload"))
+    return size, written - started, read - written
+
+
+def main(rows=200000):
+    """
+    Prints the ratio and throughput of each codec
+    :param rows:
+    :return:
+    """
+    data = _payload(rows)
+    print(f"{len(data) / 2**20:.1f} MiB of JSON, {os.cpu_count()} cores")
+    with TemporaryDirectory() as tmp:
+        block = AbstractLocalFileSystem(root_path=tmp)
+        for compression in codecs:
+            size, compress, decompress = _timed(block, tmp, compression, data)
+            print(
+                f"{compression}: ratio {len(data) / size:.1f}, "
+                f"compress {len(data) / compress / 2**20:.1f} MiB/s, "
+                f"decompress {len(data) / decompress / 2**20:.1f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
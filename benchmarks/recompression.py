@@ -0,0 +1,86 @@
+"""
+Benchmarks the throughput of filesystem_copy when recompressing gzip files
+into bz2, with the codecs running in the event loop's worker threads and in a
+pool of 1, 2, 4 ... worker processes.
+
+    python benchmarks/recompression.py [files] [megabytes per file]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from prefect.logging.loggers import disable_run_logger
+
+from prefect_filesystem.abstract_local_filesystem import AbstractLocalFileSystem
+from prefect_filesystem.tasks import filesystem_copy
+
+
+def _write_sources(block, files, size):
+    """
+    Writes files gzip files of size bytes of compressible data
+    :param block:
+    :param files:
+    :param size:
+    :return:
+    """
+    line = b"".join(os.urandom(8).hex().encode() + b"," for _ in range(32)) + b"\n"
+    data = line * (size // len(line))
+    for n in range(files):
+        with block.open(f"in/{n}.gz", "wb", compression="gzip") as fd:
+            fd.write(data)
+    return len(data) * files
+
+
+async def _copy(block, files, max_processes):
+    """
+    Recompresses every source into bz2, returning the elapsed seconds
+    :param block:
+    :param files:
+    :param max_processes:
+    :return:
+    """
+    started = time.monotonic()
+    await filesystem_copy.fn(
+        source_filename="in/{n}.gz",
+        source_filesystem=block,
+        source_compression="gzip",
+        target_filename="out/{n}.bz2",
+        target_filesystem=block,
+        target_compression="bz2",
+        datasource=[dict(n=n) for n in range(files)],
+        max_concurrency=files,
+        max_processes=max_processes,
+        stage=False,
+    )
+    return time.monotonic() - started
+
+
+def main(files=8, megabytes=16):
+    """
+    Prints the throughput of each configuration
+    :param files:
+    :param megabytes:
+    :return:
+    """
+    with TemporaryDirectory() as tmp, disable_run_logger():
+        block = AbstractLocalFileSystem(root_path=tmp, auto_mkdir=True)
+        total = _write_sources(block, files, megabytes * 1024 * 1024)
+        print(f"{files} files, {total / 2**20:.0f} MiB, {os.cpu_count()} cores")
+
+        processes = [None]
+        while len(processes) == 1 or processes[-1] < min(files, os.cpu_count()):
+            processes.append(2 ** (len(processes) - 1))
+
+        for max_processes in processes:
+            seconds = asyncio.run(_copy(block, files, max_processes))
+            print(
+                f"max_processes={max_processes}: {seconds:.2f}s, "
+                f"{total / seconds / 2**20:.1f} MiB/s"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -3,16 +3,23 @@ Abstract Block
 """
 
 import os
+from fnmatch import fnmatchcase
+from functools import partial
+from glob import has_magic
 from io import TextIOWrapper
-from typing import IO, AnyStr, Tuple, Union
+from typing import IO, AnyStr, Iterator, List, Optional, Tuple, Union
 
 from anyio import AsyncFile
 from fsspec import AbstractFileSystem
+from fsspec.compression import compr as fsspec_compr
 from fsspec.implementations.local import LocalFileSystem as FsSpecLocalFileSystem
+from fsspec.utils import infer_compression
 from prefect.filesystems import LocalFileSystem as PrefectLocalFileSystem
 from prefect.utilities.asyncutils import run_sync_in_worker_thread
 
+from prefect_filesystem.archive import ZipArchive
 from prefect_filesystem.compression import compr
+from prefect_filesystem.rate_limit import RateLimit, RateLimitedFile, rate_limit_for
 
 
 class BlockType:
@@ -49,16 +56,19 @@ class AbstractBlock(BlockType):
         return os.path.join(self.basepath, path.lstrip("/"))
 
     def open(
-        self, filepath: str, mode: str = "rb", compression=None, **kwargs
+        self, filepath: str, mode: str = "rb", compression=None, wrap=None, **kwargs
     ) -> IO[AnyStr]:
         """
         Opens the provided filename and applies compression wrappers. We apply
         custom compression wrappers due to the absense of some features in the
-        fsspec compression wrappers.
+        fsspec compression wrappers. When supplied, wrap is applied to the stored
+        file beneath any compression wrapper, e.g. to observe the raw bytes.
+        The block's rate limit, if any, paces the stored bytes beneath wrap.
 
         :param filepath:
         :param mode:
         :param compression:
+        :param wrap:
         :param kwargs:
         :return: io.IOBase
         """
@@ -67,11 +77,41 @@ class AbstractBlock(BlockType):
         full_path = self.build_path(filepath)
 
         compression, compression_options = _resolve_compression(compression)
+        if compression == "infer":
+            compression = infer_compression(full_path)
         compress_fn = compr.get(compression)
 
-        if compress_fn is None:
+        limit = self.rate_limit()
+        if limit is not None:
+            limit.opened()
+            wrap = _rate_limited(limit, wrap)
+
+        if compress_fn is None and wrap is not None and compression is not None:
+            compress_fn = partial(_fsspec_compress, fsspec_compr[compression])
+        if compress_fn is None and wrap is None:
             return fs.open(full_path, mode, compression=compression, **kwargs)
-        return _fs_open(fs, full_path, mode, compress_fn, compression_options, **kwargs)
+        return _fs_open(
+            fs, full_path, mode, compress_fn, compression_options, wrap=wrap, **kwargs
+        )
+
+    def open_archive(self, filepath: str, mode: str = "r", **kwargs) -> ZipArchive:
+        """
+        Opens the zip archive at filepath as a ZipArchive handle, reading its
+        central directory once so that many members can be listed and opened,
+        or writing many members in a single session. The archive is opened
+        through open, so the block's rate limit applies
+
+        :param filepath:
+        :param mode: "r" or "w"
+        :param kwargs: passed to ZipArchive
+        :return:
+        """
+        f = self.open(filepath, mode[0] + "b")
+        try:
+            return ZipArchive(f, mode, **kwargs)
+        except BaseException:
+            f.close()
+            raise
 
     async def open_async(self, filename: str, mode: str = "rb", **kwargs) -> AsyncFile:
         """
@@ -85,6 +125,114 @@ class AbstractBlock(BlockType):
             await run_sync_in_worker_thread(self.open, filename, mode, **kwargs)
         )
 
+    def reconnect(self):
+        """
+        Drops the cached filesystem instances of this block's filesystem type,
+        so the next open connects afresh instead of reusing a connection that
+        has failed
+        :return:
+        """
+        type(self._resolve_abstract_filesystem()).clear_instance_cache()
+
+    def rate_limit(self) -> Optional[RateLimit]:
+        """
+        The rate limit attached to this block or its type, see set_rate_limit
+        :return:
+        """
+        return rate_limit_for(self)
+
+    def iter_files(self, pattern: str) -> Iterator[dict]:
+        """
+        Lazily lists the files matching a glob pattern relative to the basepath.
+        "**" matches any number of folders and a pattern without wildcards
+        matches everything below that prefix, or the file it names. Folders
+        that cannot contain a match are not listed. Yields dictionaries with the
+        relative path, name and size of each file
+
+        :param pattern:
+        :return:
+        """
+        fs = self._resolve_abstract_filesystem()
+        segments = pattern.strip("/").split("/")
+        if not has_magic(pattern):
+            segments.append("**")
+
+        static = []
+        for segment in segments[:-1]:
+            if has_magic(segment):
+                break
+            static.append(segment)
+
+        root = fs._strip_protocol(self.basepath).rstrip("/")
+        return _walk_glob(fs, root, static, segments)
+
+
+def _walk_glob(fs, root: str, folder: List[str], segments: List[str]):
+    """
+    Depth first walk yielding the files that match segments
+    :param fs:
+    :param root:
+    :param folder:
+    :param segments:
+    :return:
+    """
+    path = "/".join([root, *folder])
+    try:
+        listing = sorted(fs.ls(path, detail=True), key=lambda x: x["name"])
+    except NotADirectoryError:
+        listing = [fs.info(path)]
+    except FileNotFoundError:
+        return
+
+    for info in listing:
+        name = fs._strip_protocol(info["name"]).rstrip("/")
+        if name == path:
+            # The static prefix names a file rather than a folder
+            parts = folder
+            if not parts or info["type"] == "directory":
+                continue
+        else:
+            parts = [*folder, name.rsplit("/", 1)[-1]]
+        if info["type"] == "directory":
+            if _could_contain(parts, segments):
+                yield from _walk_glob(fs, root, parts, segments)
+        elif _glob_match(parts, segments):
+            yield dict(path="/".join(parts), name=parts[-1], size=info.get("size"))
+
+
+def _glob_match(parts: List[str], segments: List[str]) -> bool:
+    """
+    Matches path parts against glob segments, where "**" spans any number of
+    parts
+    :param parts:
+    :param segments:
+    :return:
+    """
+    if not segments:
+        return not parts
+    if segments[0] == "**":
+        return any(_glob_match(parts[n:], segments[1:]) for n in range(len(parts) + 1))
+    return (
+        bool(parts)
+        and fnmatchcase(parts[0], segments[0])
+        and _glob_match(parts[1:], segments[1:])
+    )
+
+
+def _could_contain(parts: List[str], segments: List[str]) -> bool:
+    """
+    Whether a folder could hold files matching the glob segments
+    :param parts:
+    :param segments:
+    :return:
+    """
+    for part, segment in zip(parts, segments):
+        if segment == "**":
+            return True
+        if not fnmatchcase(part, segment):
+            return False
+    return len(parts) < len(segments)
+
 
 def _fs_open(
     fs,
@@ -95,6 +243,7 @@ def _fs_open(
     encoding=None,
     errors=None,
     newline=None,
+    wrap=None,
     **kwargs,
 ):
     """
@@ -107,14 +256,15 @@ def _fs_open(
     :param encoding:
     :param errors:
     :param newline:
+    :param wrap:
     :param kwargs:
     :return:
     """
-    f = compress_fn(
-        fs.open(path, mode.replace("t", "b"), **kwargs),
-        mode,
-        **(compression_options or {}),
-    )
+    f = fs.open(path, mode.replace("t", "b"), **kwargs)
+    if wrap is not None:
+        f = wrap(f)
+    if compress_fn is not None:
+        f = compress_fn(f, mode, **(compression_options or {}))
 
     return (
         f
@@ -123,6 +273,30 @@ def _fs_open(
     )
 
 
+def _rate_limited(limit: RateLimit, wrap=None):
+    """
+    Wrapper pacing the stored file by limit, beneath wrap when set
+    :param limit:
+    :param wrap:
+    :return:
+    """
+    if wrap is None:
+        return partial(RateLimitedFile, limit=limit)
+    return lambda f: wrap(RateLimitedFile(f, limit))
+
+
+def _fsspec_compress(compress_fn, infile, mode, **kwargs):
+    """
+    Adapts an fsspec compression callback, which takes a single character mode
+    :param compress_fn:
+    :param infile:
+    :param mode:
+    :param kwargs:
+    :return:
+    """
+    return compress_fn(infile, mode=mode[0], **kwargs)
+
+
 def _resolve_compression(compression) -> Tuple[str, Union[dict, None]]:
     """
     When compression is supplied as a dictionary we extract the compression_type and
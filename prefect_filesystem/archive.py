@@ -0,0 +1,538 @@
+"""
+Archive writers and readers used to pack many files into a single target
+"""
+
+import bz2
+import io
+import shutil
+import struct
+import tarfile
+import zlib
+from datetime import datetime
+from io import TextIOWrapper
+from tempfile import SpooledTemporaryFile
+from typing import IO, List, Optional, Tuple
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile, ZipInfo
+
+from prefect_filesystem.file_wrapper import FileWrapper
+
+archive_types = {"zip", "tar", "tar:gz", "tar:bz2", "tar:xz"}
+
+
+class Unseekable(FileWrapper):
+    """
+    Hides the ability to seek, so zip members are streamed with trailing data
+    descriptors rather than by seeking back to patch each member header. This
+    lets zip files be written straight into remote file objects
+    """
+
+    def seekable(self):
+        """
+
+        :return:
+        """
+        return False
+
+    def seek(self, *args):
+        """
+
+        :param args:
+        :return:
+        """
+        raise OSError("Archive target is written as a stream")
+
+
+class ArchiveWriter:
+    """
+    Writes members one after another into a zip or tar archive (optionally
+    compressed, e.g. "tar:gz") without seeking the target. The bytes of a
+    member are written as they are read from its source
+    """
+
+    def __init__(self, fileobj: IO[bytes], archive_type: str = "zip", **kwargs):
+        if archive_type not in archive_types:
+            raise Exception(f"Unsupported archive type {archive_type}")
+        self.archive_type = archive_type
+        if archive_type == "zip":
+            self._zip = ZipFile(
+                Unseekable(fileobj), "w", kwargs.pop("compression", ZIP_DEFLATED)
+            )
+        else:
+            self._tar = tarfile.open(
+                fileobj=fileobj, mode=f"w|{archive_type[4:]}", **kwargs
+            )
+
+    def add(
+        self,
+        name: str,
+        fileobj: IO[bytes],
+        size: Optional[int] = None,
+        block_size: int = 1024 * 1024,
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Adds a member named name with the content of fileobj. Tar headers hold
+        the member size, so when size is not known the content is spooled
+        first, in memory up to block_size bytes. Returns the size of the member
+        and, for zip members, its stored size
+        :param name:
+        :param fileobj:
+        :param size:
+        :param block_size:
+        :return:
+        """
+        if self.archive_type == "zip":
+            info = ZipInfo(name, datetime.now().timetuple()[:6])
+            info.compress_type = self._zip.compression
+            with self._zip.open(info, "w", force_zip64=True) as member:
+                shutil.copyfileobj(fileobj, member, block_size)
+            return info.file_size, info.compress_size
+
+        info = tarfile.TarInfo(name)
+        info.mtime = int(datetime.now().timestamp())
+        if size is not None:
+            info.size = size
+            self._tar.addfile(info, fileobj)
+            return size, None
+
+        with SpooledTemporaryFile(block_size) as spool:
+            shutil.copyfileobj(fileobj, spool, block_size)
+            info.size = spool.tell()
+            spool.seek(0)
+            self._tar.addfile(info, spool)
+        return info.size, None
+
+    def close(self):
+        """
+        Writes the archive trailer
+        :return:
+        """
+        if self.archive_type == "zip":
+            self._zip.close()
+        else:
+            self._tar.close()
+
+
+class ZipArchive:
+    """
+    Handle on a zip archive that is opened once. When reading, the central
+    directory is parsed when the handle is created and members are then
+    listed and opened by name from it without reading the directory again.
+    When writing, any number of members are added in a single session and the
+    directory is written on close. Members are streamed with data descriptors,
+    so the target is never seeked
+    """
+
+    def __init__(
+        self,
+        fileobj: IO[bytes],
+        mode: str = "r",
+        compression: int = ZIP_DEFLATED,
+        **kwargs,
+    ):
+        self.fileobj = fileobj
+        self.mode = mode[0]
+        if self.mode == "r":
+            self._zip = ZipFile(fileobj, "r", **kwargs)
+        else:
+            self._zip = ZipFile(Unseekable(fileobj), self.mode, compression, **kwargs)
+
+    def namelist(self) -> List[str]:
+        """
+        Names of the members, in archive order
+        :return:
+        """
+        return self._zip.namelist()
+
+    def members(self) -> List[dict]:
+        """
+        Name, size and stored size of each member file, in archive order
+        :return:
+        """
+        return [
+            dict(name=i.filename, size=i.file_size, compressed_size=i.compress_size)
+            for i in self._zip.infolist()
+            if not i.is_dir()
+        ]
+
+    def open(
+        self,
+        name: str,
+        mode: str = "rb",
+        encoding: Optional[str] = None,
+        force_zip64: bool = True,
+    ) -> IO:
+        """
+        Opens the member name for reading, or adds it for writing. Only one
+        member may be written at a time
+        :param name:
+        :param mode:
+        :param encoding:
+        :param force_zip64:
+        :return:
+        """
+        if "r" in mode:
+            fo = self._zip.open(name, "r")
+        else:
+            info = ZipInfo(name, datetime.now().timetuple()[:6])
+            info.compress_type = self._zip.compression
+            fo = self._zip.open(info, "w", force_zip64=force_zip64)
+        return fo if "t" not in mode else TextIOWrapper(fo, encoding=encoding)
+
+    def write(self, name: str, data):
+        """
+        Adds the member name with the supplied bytes or str
+        :param name:
+        :param data:
+        :return:
+        """
+        with self.open(name, "wb") as fo:
+            fo.write(data.encode() if isinstance(data, str) else data)
+
+    def close(self):
+        """
+        Writes the central directory when writing, and closes the archive file
+        :return:
+        """
+        try:
+            self._zip.close()
+        finally:
+            self.fileobj.close()
+
+    def __enter__(self):
+        """
+
+        :return:
+        """
+        return self
+
+    def __exit__(self, *args):
+        """
+
+        :param args:
+        :return:
+        """
+        self.close()
+
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_END_SIGNATURES = {b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06"}
+
+
+class _Stream:
+    """
+    Sequential reads of a file, with bytes read too far pushed back
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self._pushed = b""
+
+    def read(self, size: int) -> bytes:
+        """
+        Reads up to size bytes, the pushed back bytes first
+        :param size:
+        :return:
+        """
+        if self._pushed:
+            chunk, self._pushed = self._pushed[:size], self._pushed[size:]
+            return chunk
+        return self.fileobj.read(size)
+
+    def read_exact(self, size: int) -> bytes:
+        """
+        Reads size bytes, fewer only at the end of the file
+        :param size:
+        :return:
+        """
+        chunks = []
+        while size > 0:
+            chunk = self.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def unread(self, data: bytes):
+        """
+        Pushes data back to be read again
+        :param data:
+        :return:
+        """
+        self._pushed = data + self._pushed
+
+
+class StreamedZipMember(io.BufferedIOBase):
+    """
+    A zip member read from a StreamingZipReader as its bytes arrive. size is
+    None until the member is read when it is followed by a data descriptor.
+    The CRC and size are checked once the member has been read
+    """
+
+    def __init__(self, stream: _Stream, name: str, header: tuple, zip64: bool):
+        _, _, flags, method, _, _, crc, compressed_size, size, _, _ = header
+        if flags & 0x1:
+            raise BadZipFile(f"{name} is encrypted")
+        if method not in (ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2):
+            raise BadZipFile(f"{name} uses unsupported compression method {method}")
+        self.name = name
+        self.method = method
+        self._stream = stream
+        self._zip64 = zip64
+        self._descriptor = bool(flags & 0x8)
+        self.crc = None if self._descriptor else crc
+        self.size = None if self._descriptor else size
+        self.compressed_size = None if self._descriptor else compressed_size
+        self._remaining = self.compressed_size
+        self._decompressor = (
+            zlib.decompressobj(-15)
+            if method == ZIP_DEFLATED
+            else bz2.BZ2Decompressor()
+            if method == ZIP_BZIP2
+            else None
+        )
+        self._crc = 0
+        self._read = 0
+        self._consumed = 0
+        self._scanned = b""
+        self._data = b""
+        self._done = False
+
+    def is_dir(self) -> bool:
+        """
+
+        :return:
+        """
+        return self.name.endswith("/")
+
+    def readable(self):
+        """
+
+        :return:
+        """
+        return True
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        if size is None or size < 0:
+            size = None
+        chunks = []
+        while size is None or size > 0:
+            if not self._data:
+                if self._done:
+                    break
+                self._data = self._next_block()
+                continue
+            chunk = self._data if size is None else self._data[:size]
+            self._data = self._data[len(chunk) :]
+            chunks.append(chunk)
+            if size is not None:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    read1 = read
+
+    def drain(self):
+        """
+        Reads past the rest of the member
+        :return:
+        """
+        while not self._done:
+            self._next_block()
+        self._data = b""
+
+    def _next_block(self, block_size: int = 64 * 1024) -> bytes:
+        """
+        Reads and decompresses the next block of the member
+        :param block_size:
+        :return:
+        """
+        if self._remaining is not None:
+            data = self._stream.read(min(block_size, self._remaining))
+            self._remaining -= len(data)
+        elif self._decompressor is None:
+            return self._scan_stored(block_size)
+        else:
+            data = self._stream.read(block_size)
+        if not data and self._remaining != 0:
+            raise EOFError(f"Zip file ended within {self.name}")
+        self._consumed += len(data)
+
+        out = (
+            data if self._decompressor is None else self._decompressor.decompress(data)
+        )
+        self._update(out)
+        if self._decompressor is not None and self._decompressor.eof:
+            unused = self._decompressor.unused_data
+            self._consumed -= len(unused)
+            if self._remaining is None:
+                self._stream.unread(unused)
+            self._finish()
+        elif self._remaining == 0:
+            self._finish()
+        return out
+
+    def _scan_stored(self, block_size: int) -> bytes:
+        """
+        Stored members followed by a data descriptor only end where a
+        descriptor matching the bytes before it is found
+        :param block_size:
+        :return:
+        """
+        data = self._stream.read(block_size)
+        if not data:
+            raise EOFError(f"Zip file ended within {self.name}")
+        buffer = self._scanned + data
+        length = 24 if self._zip64 else 16
+        position = buffer.find(_DESCRIPTOR_SIGNATURE)
+        while position >= 0:
+            if len(buffer) - position < length:
+                break
+            crc, compressed_size = struct.unpack_from(
+                "<IQ" if self._zip64 else "<II", buffer, position + 4
+            )
+            if compressed_size == self._consumed + position and crc == zlib.crc32(
+                buffer[:position], self._crc
+            ):
+                self._stream.unread(buffer[position:])
+                self._scanned = b""
+                out = buffer[:position]
+                self._consumed += len(out)
+                self._update(out)
+                self._finish()
+                return out
+            position = buffer.find(_DESCRIPTOR_SIGNATURE, position + 1)
+        # Keep what could be the start of a descriptor for the next block
+        keep = len(buffer) - position if position >= 0 else length - 1
+        out, self._scanned = buffer[:-keep], buffer[-keep:]
+        self._consumed += len(out)
+        self._update(out)
+        return out
+
+    def _update(self, out: bytes):
+        """
+        Accounts for decompressed bytes
+        :param out:
+        :return:
+        """
+        self._crc = zlib.crc32(out, self._crc)
+        self._read += len(out)
+
+    def _finish(self):
+        """
+        Reads any data descriptor and checks the CRC and size
+        :return:
+        """
+        self._done = True
+        if self._descriptor:
+            signature = self._stream.read_exact(4)
+            if signature != _DESCRIPTOR_SIGNATURE:
+                self._stream.unread(signature)
+            fields = "<IQQ" if self._zip64 else "<III"
+            descriptor = self._stream.read_exact(struct.calcsize(fields))
+            self.crc, self.compressed_size, self.size = struct.unpack(
+                fields, descriptor
+            )
+        if self.crc != self._crc or self.size != self._read:
+            raise BadZipFile(f"Bad CRC-32 or size for {self.name}")
+
+
+class StreamingZipReader:
+    """
+    Reads the members of a zip archive in order from their local headers, in
+    a single sequential pass that never seeks, so archives can be unpacked
+    from non-seekable streams and remote files at the speed of the link.
+    Members followed by data descriptors are supported. Reading the next
+    member skips whatever is left of the current one, and the central
+    directory at the end is not read
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self._stream = _Stream(fileobj)
+        self._member = None
+
+    def next(self) -> Optional[StreamedZipMember]:
+        """
+        The next member, or None after the last
+        :return:
+        """
+        if self._member is not None:
+            self._member.drain()
+            self._member = None
+        signature = self._stream.read_exact(4)
+        if not signature or signature in _END_SIGNATURES:
+            return None
+        if signature != _LOCAL_SIGNATURE:
+            raise BadZipFile("Bad magic number for file header")
+        header = _LOCAL_HEADER.unpack(
+            signature + self._stream.read_exact(_LOCAL_HEADER.size - 4)
+        )
+        flags, name_length, extra_length = header[2], header[9], header[10]
+        name = self._stream.read_exact(name_length)
+        extra = self._stream.read_exact(extra_length)
+        name = name.decode("utf-8" if flags & 0x800 else "cp437")
+        self._member = StreamedZipMember(
+            self._stream, name, _zip64(header, extra), _has_zip64(extra)
+        )
+        return self._member
+
+    def __iter__(self):
+        """
+        Iterates the members
+        :return:
+        """
+        while True:
+            member = self.next()
+            if member is None:
+                return
+            yield member
+
+
+def _has_zip64(extra: bytes) -> bool:
+    """
+    Whether a local header extra field holds a zip64 record, in which case
+    any data descriptor has 8 byte sizes
+    :param extra:
+    :return:
+    """
+    return _extra_record(extra, 0x0001) is not None
+
+
+def _zip64(header: tuple, extra: bytes) -> tuple:
+    """
+    Replaces the sizes of a local header that overflowed into its zip64
+    extra record
+    :param header:
+    :param extra:
+    :return:
+    """
+    record = _extra_record(extra, 0x0001)
+    header = list(header)
+    for n in (8, 7):
+        if record and header[n] == 0xFFFFFFFF:
+            header[n] = struct.unpack_from("<Q", record)[0]
+            record = record[8:]
+    return tuple(header)
+
+
+def _extra_record(extra: bytes, header_id: int) -> Optional[bytes]:
+    """
+    The data of the extra field record with header_id, if any
+    :param extra:
+    :param header_id:
+    :return:
+    """
+    position = 0
+    while position + 4 <= len(extra):
+        record_id, length = struct.unpack_from("<HH", extra, position)
+        if record_id == header_id:
+            return extra[position + 4 : position + 4 + length]
+        position += 4 + length
+    return None
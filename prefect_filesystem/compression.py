@@ -2,9 +2,22 @@
 Providers enhanced file compression wrappers
 """
 
+import gzip
+import io
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import List, Optional, Tuple, Union
 from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 
+from fsspec.utils import infer_compression
+
+from prefect_filesystem.archive import StreamingZipReader
+
 
 def named_unzip(
     infile,
@@ -12,15 +25,19 @@ def named_unzip(
     filename=None,
     compression_type=ZIP_DEFLATED,
     force_zip64=True,
-    **kwargs
+    stream=False,
+    **kwargs,
 ):
     """
-    Return file-like object for archive file 'filename' within the file provide
+    Return file-like object for archive file 'filename' within the file provide.
+    Archives that cannot seek, or any archive when stream is set, are read
+    sequentially up to the member rather than through the central directory
     :param infile:
     :param mode:
     :param filename:
     :param compression_type:
     :param force_zip64:
+    :param stream:
     :param kwargs:
     :return:
     """
@@ -34,9 +51,692 @@ def named_unzip(
         fo.close = lambda closer=fo.close: closer() or zip_file.close()
         return fo
 
+    if stream or not infile.seekable():
+        for member in StreamingZipReader(infile):
+            if filename is None or member.name == filename:
+                return member
+        raise KeyError(f"There is no item named {filename!r} in the archive")
+
     zip_file = ZipFile(infile)
     filename = filename or zip_file.namelist()[0]
     return zip_file.open(filename, "r", **kwargs)
 
 
-compr = {"zip_ex": named_unzip}
+def zstd_file(
+    infile,
+    mode,
+    level: int = 3,
+    threads: int = 0,
+    long: Union[bool, int] = False,
+    checksum: bool = True,
+):
+    """
+    Return file-like object reading or writing Zstandard frames. Options are
+    carried in the CompressionType dictionary, e.g.
+    {"type": "zstd", "level": 19, "threads": -1, "long": True}.
+
+    threads compresses on that many worker threads, -1 meaning one per core.
+    long enables long distance matching with a 128MiB window, or a window of
+    2**long bytes when an int. Readers accept windows up to 2GiB, so files
+    written with long windows need no options to be read back. Consecutive
+    frames, e.g. from appends, are read as a single stream.
+
+    Requires the zstandard package
+    :param infile:
+    :param mode:
+    :param level:
+    :param threads:
+    :param long:
+    :param checksum:
+    :return:
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("The zstandard package is required for zstd compression")
+
+    if "r" in mode:
+        reader = zstandard.ZstdDecompressor(max_window_size=2**31).stream_reader(
+            infile, read_across_frames=True, closefd=True
+        )
+        return io.BufferedReader(reader)
+
+    params = zstandard.ZstdCompressionParameters.from_level(
+        level,
+        threads=threads,
+        write_checksum=checksum,
+        enable_ldm=bool(long),
+        window_log=(27 if long is True else long) if long else 0,
+    )
+    return zstandard.ZstdCompressor(compression_params=params).stream_writer(
+        infile, closefd=True
+    )
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """
+    Writes a multi-member gzip stream, compressing each block_size block of
+    the input as an independent member on a pool of threads, as pigz does.
+    zlib releases the GIL so blocks are compressed on several cores at once.
+    Members are written in order, and at most two blocks per thread are held
+    in memory. Standard gunzip and gzip readers read the members as one stream
+    """
+
+    def __init__(
+        self,
+        fileobj,
+        level: int = 6,
+        block_size: int = 1024 * 1024,
+        threads: Optional[int] = None,
+    ):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        threads = threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(threads)
+        self._max_pending = 2 * threads
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._members = 0
+
+    def writable(self):
+        """
+
+        :return:
+        """
+        return True
+
+    def write(self, b):
+        """
+        Buffers b, submitting each complete block for compression
+        :param b:
+        :return:
+        """
+        if self.closed:
+            raise ValueError("write to closed file")
+        view = memoryview(b).cast("B")
+        size = len(view)
+        if self._buffer:
+            fill = min(size, self.block_size - len(self._buffer))
+            self._buffer += view[:fill]
+            view = view[fill:]
+            if len(self._buffer) == self.block_size:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+        while len(view) >= self.block_size:
+            self._submit(bytes(view[: self.block_size]))
+            view = view[self.block_size :]
+        self._buffer += view
+        return size
+
+    def _submit(self, block: bytes):
+        """
+        Queues a block for compression, first writing out the oldest members
+        while too many are pending
+        :param block:
+        :return:
+        """
+        while len(self._pending) >= self._max_pending:
+            self._write_pending()
+        member = self._executor.submit(_gzip_member, block, self.level)
+        self._pending.append((member, len(block)))
+        self._members += 1
+
+    def _write_pending(self):
+        """
+        Waits for the oldest pending member and writes it
+        :return:
+        """
+        member, size = self._pending.popleft()
+        self._write_member(member.result(), size)
+
+    def _write_member(self, member: bytes, size: int):
+        """
+        Writes a compressed member holding size bytes of the input
+        :param member:
+        :param size:
+        :return:
+        """
+        self.fileobj.write(member)
+
+    def _write_trailer(self):
+        """
+        Writes anything following the last member
+        :return:
+        """
+
+    def close(self):
+        """
+        Compresses what remains, writes every pending member and closes the
+        underlying file. An empty input is written as a single empty member
+        :return:
+        """
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._members:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._write_pending()
+            self._write_trailer()
+            self.fileobj.close()
+        finally:
+            self._executor.shutdown()
+            super().close()
+
+
+def _extra_member(
+    subfield: bytes,
+    data: bytes,
+    deflated: bytes = b"\x03\x00",
+    crc: int = 0,
+    size: int = 0,
+) -> bytes:
+    """
+    A gzip member with data in an extra field subfield. The defaults make an
+    empty member, which gzip readers skip as they skip extra fields
+    :param subfield:
+    :param data:
+    :param deflated:
+    :param crc:
+    :param size:
+    :return:
+    """
+    extra = subfield + struct.pack("<H", len(data)) + data
+    return (
+        b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff"
+        + struct.pack("<H", len(extra))
+        + extra
+        + deflated
+        + struct.pack("<II", crc, size & 0xFFFFFFFF)
+    )
+
+
+def _gzip_member(block: bytes, level: int) -> bytes:
+    """
+    Compresses block into a complete gzip member, recording the size of the
+    member in an "MS" extra subfield so readers can find the next member
+    without decompressing this one
+    :param block:
+    :param level:
+    :return:
+    """
+    z = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = z.compress(block) + z.flush()
+    # 10 byte header, 2 byte extra length, 12 byte subfield and 8 byte trailer
+    member_size = struct.pack("<Q", len(deflated) + 32)
+    return _extra_member(b"MS", member_size, deflated, zlib.crc32(block), len(block))
+
+
+def _member_size(extra: bytes) -> Optional[int]:
+    """
+    Size of a gzip member from the "MS" subfield written by _gzip_member, or
+    the "BC" subfield written by bgzip, if either is in the extra field
+    :param extra:
+    :return:
+    """
+    position = 0
+    while position + 4 <= len(extra):
+        subfield = extra[position : position + 2]
+        (length,) = struct.unpack_from("<H", extra, position + 2)
+        if subfield == b"MS" and length == 8:
+            return struct.unpack_from("<Q", extra, position + 4)[0]
+        if subfield == b"BC" and length == 2:
+            return struct.unpack_from("<H", extra, position + 4)[0] + 1
+        position += 4 + length
+    return None
+
+
+def _read_exact(f, size: int) -> bytes:
+    """
+    Reads size bytes, fewer only at the end of the file
+    :param f:
+    :param size:
+    :return:
+    """
+    chunks = []
+    while size > 0:
+        chunk = f.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _Prefixed:
+    """
+    Reads prefix and then the rest of fileobj
+    """
+
+    def __init__(self, prefix: bytes, fileobj):
+        self.prefix = prefix
+        self.fileobj = fileobj
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        if not self.prefix:
+            return self.fileobj.read(size)
+        if size is None or size < 0:
+            chunk, self.prefix = self.prefix + self.fileobj.read(), b""
+            return chunk
+        chunk, self.prefix = self.prefix[:size], self.prefix[size:]
+        return chunk
+
+
+class ParallelGzipReader(io.BufferedIOBase):
+    """
+    Reads multi-member gzip, decompressing members on a pool of threads. The
+    size of each member is taken from its header, as written by
+    ParallelGzipWriter and bgzip, so the file is read in a single sequential
+    pass. At most read_ahead members are decompressed ahead of the reader and
+    their output is returned in order.
+
+    Finding where a member without a size ends means decompressing it, so
+    from the first such member the rest of the file is decompressed in the
+    reading thread as plain gzip
+    """
+
+    def __init__(
+        self, fileobj, threads: Optional[int] = None, read_ahead: Optional[int] = None
+    ):
+        self.fileobj = fileobj
+        threads = threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(threads)
+        self._read_ahead = read_ahead or 2 * threads
+        self._pending = deque()
+        self._data = b""
+        self._offset = 0
+        self._sequential = None
+        self._eof = False
+
+    def readable(self):
+        """
+
+        :return:
+        """
+        return True
+
+    def _next_member(self) -> Optional[bytes]:
+        """
+        Reads the next member with a known size, otherwise switches to
+        sequential reads
+        :return:
+        """
+        header = _read_exact(self.fileobj, 10)
+        if not header:
+            self._eof = True
+            return None
+        size = None
+        if len(header) == 10 and header[3] & 4:
+            xlen = _read_exact(self.fileobj, 2)
+            extra = _read_exact(self.fileobj, struct.unpack("<H", xlen)[0])
+            header += xlen + extra
+            size = _member_size(extra)
+        if size is None:
+            self._sequential = gzip.GzipFile(fileobj=_Prefixed(header, self.fileobj))
+            return None
+        member = header + _read_exact(self.fileobj, size - len(header))
+        if len(member) < size:
+            raise EOFError(
+                "Compressed file ended before the end-of-stream marker was reached"
+            )
+        return member
+
+    def _fill(self):
+        """
+        Submits members until read_ahead are pending
+        :return:
+        """
+        while (
+            not self._eof
+            and self._sequential is None
+            and len(self._pending) < self._read_ahead
+        ):
+            member = self._next_member()
+            if member is not None:
+                self._pending.append(self._executor.submit(zlib.decompress, member, 31))
+
+    def _load(self) -> bool:
+        """
+        Replaces the exhausted output with that of the next member, or the
+        next chunk of a sequential read. False at the end of the file
+        :return:
+        """
+        while True:
+            self._fill()
+            self._offset = 0
+            if self._pending:
+                self._data = self._pending.popleft().result()
+            elif self._sequential is not None:
+                self._data = self._sequential.read(1024 * 1024)
+                return bool(self._data)
+            else:
+                self._data = b""
+                return False
+            if self._data:
+                return True
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        if size is None or size < 0:
+            size = None
+        chunks = []
+        while size is None or size > 0:
+            if self._offset >= len(self._data) and not self._load():
+                break
+            end = len(self._data) if size is None else self._offset + size
+            chunk = self._data[self._offset : end]
+            self._offset += len(chunk)
+            chunks.append(chunk)
+            if size is not None:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    read1 = read
+
+    def close(self):
+        """
+
+        :return:
+        """
+        if not self.closed:
+            try:
+                for member in self._pending:
+                    member.cancel()
+                self._executor.shutdown()
+                self.fileobj.close()
+            finally:
+                super().close()
+
+
+def parallel_gzip_file(
+    infile,
+    mode,
+    threads: Optional[int] = None,
+    read_ahead: Optional[int] = None,
+    **kwargs,
+):
+    """
+    Return file-like object for multi-member gzip, writing through a
+    ParallelGzipWriter and reading through a ParallelGzipReader, e.g.
+    {"type": "pigz", "level": 6, "block_size": 1048576, "threads": 8}.
+    read_ahead bounds the members decompressed ahead of the reader
+    :param infile:
+    :param mode:
+    :param threads:
+    :param read_ahead:
+    :param kwargs:
+    :return:
+    """
+    if "r" in mode:
+        return ParallelGzipReader(infile, threads, read_ahead)
+    return ParallelGzipWriter(infile, threads=threads, **kwargs)
+
+
+_INDEX_ENTRY = struct.Struct("<QQ")
+_INDEX_TAIL = struct.Struct("<QQQ")
+_INDEX_ENTRIES_PER_MEMBER = (0xFFFF - 4) // _INDEX_ENTRY.size
+
+
+_INDEX_TAIL_SIZE = len(_extra_member(b"IT", bytes(_INDEX_TAIL.size)))
+
+
+class SeekableGzipWriter(ParallelGzipWriter):
+    """
+    Writes a multi-member gzip stream of block_size blocks, followed by an
+    index of the compressed and decompressed offset of each block. The index
+    is held in the extra fields of empty members, the last of which has a
+    fixed size and locates the rest, so the file is still standard gzip
+    """
+
+    def __init__(
+        self,
+        fileobj,
+        level: int = 6,
+        block_size: int = 64 * 1024,
+        threads: Optional[int] = None,
+    ):
+        super().__init__(fileobj, level, block_size, threads)
+        self._index = []
+        self._compressed = 0
+        self._decompressed = 0
+
+    def _write_member(self, member: bytes, size: int):
+        """
+        Writes a member, recording its offsets in the index
+        :param member:
+        :param size:
+        :return:
+        """
+        self._index.append((self._compressed, self._decompressed))
+        self.fileobj.write(member)
+        self._compressed += len(member)
+        self._decompressed += size
+
+    def _write_trailer(self):
+        """
+        Writes the index members and the fixed size tail locating them
+        :return:
+        """
+        for n in range(0, len(self._index), _INDEX_ENTRIES_PER_MEMBER):
+            entries = self._index[n : n + _INDEX_ENTRIES_PER_MEMBER]
+            data = b"".join(_INDEX_ENTRY.pack(*entry) for entry in entries)
+            self.fileobj.write(_extra_member(b"IX", data))
+        tail = _INDEX_TAIL.pack(self._compressed, len(self._index), self._decompressed)
+        self.fileobj.write(_extra_member(b"IT", tail))
+
+
+def _read_index(infile) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    Reads the index written by SeekableGzipWriter, returning the compressed
+    and decompressed offsets of each block followed by those of the end of
+    the data. None when the file has no index
+    :param infile:
+    :return:
+    """
+    size = infile.seek(0, 2)
+    if size < _INDEX_TAIL_SIZE:
+        return None
+    infile.seek(size - _INDEX_TAIL_SIZE)
+    tail = infile.read(_INDEX_TAIL_SIZE)
+    if tail[:4] != b"\x1f\x8b\x08\x04" or tail[12:14] != b"IT":
+        return None
+    end, count, total = _INDEX_TAIL.unpack_from(tail, 16)
+
+    infile.seek(end)
+    raw = infile.read(size - _INDEX_TAIL_SIZE - end)
+    entries, position = [], 0
+    while position < len(raw):
+        (xlen,) = struct.unpack_from("<H", raw, position + 10)
+        data = raw[position + 16 : position + 12 + xlen]
+        entries.extend(_INDEX_ENTRY.iter_unpack(data))
+        position += 12 + xlen + 10
+    if len(entries) != count:
+        raise Exception("Seekable gzip index is incomplete")
+    return [e[0] for e in entries] + [end], [e[1] for e in entries] + [total]
+
+
+class SeekableGzipReader(io.BufferedIOBase):
+    """
+    Reads a file written by SeekableGzipWriter. Seeking is resolved through
+    the index, so reads only fetch and decompress the blocks holding the
+    requested range. The most recently decompressed block is kept
+    """
+
+    def __init__(self, fileobj, offsets: List[int], positions: List[int]):
+        self.fileobj = fileobj
+        self._offsets = offsets
+        self._positions = positions
+        self.size = positions[-1]
+        self._position = 0
+        self._block = None
+        self._data = b""
+
+    def readable(self):
+        """
+
+        :return:
+        """
+        return True
+
+    def seekable(self):
+        """
+
+        :return:
+        """
+        return True
+
+    def tell(self):
+        """
+
+        :return:
+        """
+        return self._position
+
+    def seek(self, offset, whence=0):
+        """
+
+        :param offset:
+        :param whence:
+        :return:
+        """
+        base = (0, self._position, self.size)[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        if size is None or size < 0:
+            size = self.size - self._position
+        chunks = []
+        while size > 0 and self._position < self.size:
+            block = bisect_right(self._positions, self._position) - 1
+            self._load(block)
+            start = self._position - self._positions[block]
+            chunk = self._data[start : start + size]
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    read1 = read
+
+    def _load(self, block: int):
+        """
+        Fetches and decompresses a block unless it is already loaded
+        :param block:
+        :return:
+        """
+        if block == self._block:
+            return
+        self.fileobj.seek(self._offsets[block])
+        member = self.fileobj.read(self._offsets[block + 1] - self._offsets[block])
+        self._data = zlib.decompress(member, 31)
+        self._block = block
+
+    def close(self):
+        """
+
+        :return:
+        """
+        if not self.closed:
+            self.fileobj.close()
+            super().close()
+
+
+def seekable_gzip_file(infile, mode, **kwargs):
+    """
+    Return file-like object for seekable gzip, e.g. {"type": "seekable_gzip",
+    "block_size": 65536}. Files without an index, or on streams that cannot
+    seek, are read as a stream from the start
+    :param infile:
+    :param mode:
+    :param kwargs:
+    :return:
+    """
+    if "r" not in mode:
+        return SeekableGzipWriter(infile, **kwargs)
+    index = _read_index(infile) if infile.seekable() else None
+    if index is None:
+        if infile.seekable():
+            infile.seek(0)
+        return parallel_gzip_file(infile, mode)
+    return SeekableGzipReader(infile, *index)
+
+
+def requires_staging(compression) -> bool:
+    """
+    Zip writers seek back over the output to patch each member header, which
+    most remote file objects do not support. These need a local staging file
+    :param compression:
+    :return:
+    """
+    return _compression_type(compression) in archive_compr
+
+
+def is_passthrough(
+    source_compression, target_compression, source_path=None, target_path=None
+) -> bool:
+    """
+    True when the stored bytes can be copied as-is. "infer" is resolved from
+    each path first, so a.gz and b.bz2 are re-encoded. Archives are excluded
+    as only one member is read from them
+    :param source_compression:
+    :param target_compression:
+    :param source_path:
+    :param target_path:
+    :return:
+    """
+    source_compression = _inferred(source_compression, source_path)
+    target_compression = _inferred(target_compression, target_path)
+    return (
+        source_compression == target_compression
+        and _compression_type(source_compression) not in archive_compr
+    )
+
+
+def _inferred(compression, path):
+    """
+    The compression fsspec infers from the path's extension when compression
+    is "infer"
+    :param compression:
+    :param path:
+    :return:
+    """
+    if compression != "infer":
+        return compression
+    if path is None:
+        raise Exception('Cannot resolve "infer" compression without a path')
+    return infer_compression(path)
+
+
+def _compression_type(compression):
+    """
+    Extracts the compression name from a string or CompressionType dictionary
+    :param compression:
+    :return:
+    """
+    return compression.get("type") if isinstance(compression, dict) else compression
+
+
+compr = {
+    "zip_ex": named_unzip,
+    "zstd": zstd_file,
+    "pigz": parallel_gzip_file,
+    "seekable_gzip": seekable_gzip_file,
+}
+archive_compr = {"zip", "zip_ex"}
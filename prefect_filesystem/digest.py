@@ -0,0 +1,146 @@
+"""
+Content digests computed as bytes pass through a copy
+"""
+
+import hashlib
+import zlib
+from typing import Dict, Iterable, Optional
+
+from prefect_filesystem.file_wrapper import FileWrapper
+
+
+class _Crc32:
+    """
+    CRC32 with the update / hexdigest interface of hashlib
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, _bytes):
+        """
+
+        :param _bytes:
+        :return:
+        """
+        self.value = zlib.crc32(_bytes, self.value)
+
+    def hexdigest(self) -> str:
+        """
+
+        :return:
+        """
+        return f"{self.value:08x}"
+
+
+def _new_hash(algorithm: str):
+    """
+    Creates a hash object for the named algorithm, which is either crc32, a
+    hashlib algorithm such as md5 or sha256, or an xxhash algorithm such as
+    xxh64 or xxh3_128 when the xxhash package is installed
+    :param algorithm:
+    :return:
+    """
+    if algorithm == "crc32":
+        return _Crc32()
+    if algorithm.startswith("xxh"):
+        try:
+            import xxhash
+        except ImportError:
+            raise Exception(f"The xxhash package is required for {algorithm} digests")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+
+class Digests:
+    """
+    Running digests of a stream for several algorithms. Digests become invalid
+    when the stream is not read or written in a single sequential pass
+    """
+
+    def __init__(self, algorithms: Iterable[str]):
+        self._hashes = {a: _new_hash(a) for a in algorithms}
+        self.valid = True
+
+    def update(self, _bytes):
+        """
+        Accounts for the next block of the stream
+        :param _bytes:
+        :return:
+        """
+        for h in self._hashes.values():
+            h.update(_bytes)
+
+    def invalidate(self):
+        """
+        Marks the digests as not covering the whole stream
+        :return:
+        """
+        self.valid = False
+
+    def hexdigests(self) -> Optional[Dict[str, str]]:
+        """
+        Hex digest per algorithm, or None when the digests are invalid
+        :return:
+        """
+        if not self.valid:
+            return None
+        return {a: h.hexdigest() for a, h in self._hashes.items()}
+
+
+class DigestingFile(FileWrapper):
+    """
+    Wraps a binary file and feeds the bytes read from or written to it into
+    digests. Seeking anywhere other than the current position invalidates them
+    """
+
+    def __init__(self, f, digests: Digests):
+        super().__init__(f)
+        self.digests = digests
+        self._position = 0
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        _bytes = self.f.read(size)
+        self._position += len(_bytes)
+        self.digests.update(_bytes)
+        return _bytes
+
+    def readinto(self, b):
+        """
+
+        :param b:
+        :return:
+        """
+        n = self.f.readinto(b)
+        self._position += n
+        self.digests.update(memoryview(b)[:n])
+        return n
+
+    def write(self, _bytes):
+        """
+
+        :param _bytes:
+        :return:
+        """
+        n = self.f.write(_bytes)
+        self._position += len(_bytes)
+        self.digests.update(_bytes)
+        return n
+
+    def seek(self, offset, whence=0):
+        """
+
+        :param offset:
+        :param whence:
+        :return:
+        """
+        position = self.f.seek(offset, whence)
+        if position != self._position:
+            self.digests.invalidate()
+            self._position = position
+        return position
@@ -0,0 +1,43 @@
+"""
+Base of the file objects layered over another file
+"""
+
+
+class FileWrapper:
+    """
+    Wraps a file object, delegating everything a subclass does not override
+    to the wrapped file
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def close(self):
+        """
+
+        :return:
+        """
+        self.f.close()
+
+    def __enter__(self):
+        """
+
+        :return:
+        """
+        return self
+
+    def __exit__(self, *args):
+        """
+
+        :param args:
+        :return:
+        """
+        self.close()
+
+    def __getattr__(self, name):
+        """
+        Delegates everything else to the wrapped file
+        :param name:
+        :return:
+        """
+        return getattr(self.f, name)
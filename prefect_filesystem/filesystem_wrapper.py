@@ -2,6 +2,7 @@
 Provides a wrapper
 """
 from .abstract_block import AbstractBlock
+from .rate_limit import rate_limit_for
 
 
 class AbstractWrapper(AbstractBlock):
@@ -31,3 +32,20 @@ class AbstractWrapper(AbstractBlock):
         :return:
         """
         return self.block.basepath
+
+    def reconnect(self):
+        """
+        Also drops the filesystem cached by the wrapper and the wrapped block
+        :return:
+        """
+        super().reconnect()
+        self._fs = None
+        if getattr(self.block, "_filesystem", None) is not None:
+            self.block._filesystem = None
+
+    def rate_limit(self):
+        """
+        The limit attached to the wrapper, or otherwise to the wrapped block
+        :return:
+        """
+        return super().rate_limit() or rate_limit_for(self.block)
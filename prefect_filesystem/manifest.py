@@ -0,0 +1,229 @@
+"""
+Checkpoint manifest used to resume an interrupted filesystem_copy
+"""
+
+import json
+import zlib
+from typing import Optional, Tuple
+
+import anyio
+from prefect.utilities.asyncutils import run_sync_in_worker_thread
+
+
+class FileProgress:
+    """
+    Running offset and CRC32 of the bytes written to a single target file. The
+    CRC32 is None when it could not be followed across a resume
+    """
+
+    def __init__(self, offset=0, crc32=0):
+        self.offset = offset
+        self.crc32 = crc32
+
+    def update(self, _bytes):
+        """
+        Accounts for a block written to the target
+        :param _bytes:
+        :return:
+        """
+        self.offset += len(_bytes)
+        if self.crc32 is not None:
+            self.crc32 = zlib.crc32(_bytes, self.crc32)
+
+
+class CopyManifest:
+    """
+    Records the files a copy has completed, and the progress of files being
+    streamed, in a small JSON document stored on the target filesystem. A retry
+    loading the same manifest skips completed files and resumes partial ones
+    """
+
+    def __init__(self, block, filename: str, interval: float = 10.0):
+        self.block = block
+        self.filename = filename
+        self.interval = interval
+        self.completed = {}
+        self.partial = {}
+        self._lock = anyio.Lock()
+
+    @classmethod
+    async def load(cls, block, filename: str, **kwargs) -> "CopyManifest":
+        """
+        Loads the manifest from the block, or starts an empty one
+        :param block:
+        :param filename:
+        :param kwargs:
+        :return:
+        """
+        manifest = cls(block, filename, **kwargs)
+        try:
+            content = await run_sync_in_worker_thread(manifest._read)
+        except FileNotFoundError:
+            return manifest
+
+        manifest.completed = {_key(e): e for e in content.get("completed", [])}
+        manifest.partial = {_key(e): e for e in content.get("partial", [])}
+        return manifest
+
+    async def is_complete(self, source: str, target: str) -> bool:
+        """
+        True when the file was copied by an earlier attempt and the target still
+        has the recorded size
+        :param source:
+        :param target:
+        :return:
+        """
+        entry = self.completed.get((source, target))
+        return entry is not None and entry["size"] == await self._size(target)
+
+    def track(self, source: str, target: str, progress: FileProgress):
+        """
+        Registers a file being streamed so its progress is saved at checkpoints
+        :param source:
+        :param target:
+        :param progress:
+        :return:
+        """
+        self.partial[(source, target)] = progress
+
+    async def resume_point(self, source: str, target: str) -> FileProgress:
+        """
+        Returns where a partially copied file can be resumed from, which is the
+        current size of the target. Bytes that reached the target after the last
+        checkpoint are read back to bring the CRC up to date. Writes still
+        buffered at the checkpoint may have been lost, in which case the CRC is
+        dropped
+        :param source:
+        :param target:
+        :return:
+        """
+        entry = self.partial.get((source, target))
+        if not isinstance(entry, dict):
+            return FileProgress()
+
+        size = await self._size(target)
+        if size is None:
+            return FileProgress()
+        if size < entry["offset"]:
+            return FileProgress(size, None)
+
+        progress = FileProgress(entry["offset"], entry["crc32"])
+        if size > progress.offset:
+            await run_sync_in_worker_thread(self._read_into, target, progress, size)
+        return progress
+
+    async def complete(self, source: str, target: str, crc32: Optional[int]):
+        """
+        Records a file as completed
+        :param source:
+        :param target:
+        :param crc32:
+        :return:
+        """
+        self.partial.pop((source, target), None)
+        self.completed[(source, target)] = dict(
+            source=source, target=target, size=await self._size(target), crc32=crc32
+        )
+
+    async def save(self):
+        """
+        Writes the manifest to the filesystem
+        :return:
+        """
+        content = dict(
+            completed=list(self.completed.values()),
+            partial=[_partial_entry(k, v) for k, v in self.partial.items()],
+        )
+        async with self._lock:
+            await run_sync_in_worker_thread(self._write, content)
+
+    async def autosave(self):
+        """
+        Saves the manifest every interval seconds until cancelled
+        :return:
+        """
+        while True:
+            await anyio.sleep(self.interval)
+            await self.save()
+
+    async def remove(self):
+        """
+        Deletes the manifest once the copy has finished
+        :return:
+        """
+        fs = self.block._resolve_abstract_filesystem()
+        path = self.block.build_path(self.filename)
+        if await run_sync_in_worker_thread(fs.exists, path):
+            await run_sync_in_worker_thread(fs.rm, path)
+
+    async def _size(self, filename: str) -> Optional[int]:
+        """
+        Size of a file on the filesystem, or None if it does not exist
+        :param filename:
+        :return:
+        """
+        fs = self.block._resolve_abstract_filesystem()
+        try:
+            return await run_sync_in_worker_thread(
+                fs.size, self.block.build_path(filename)
+            )
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> dict:
+        """
+        Reads the manifest document
+        :return:
+        """
+        with self.block.open(self.filename, "rt") as fd:
+            return json.load(fd)
+
+    def _write(self, content: dict):
+        """
+        Writes the manifest document
+        :param content:
+        :return:
+        """
+        with self.block.open(self.filename, "wt") as fd:
+            json.dump(content, fd)
+
+    def _read_into(self, filename: str, progress: FileProgress, end: int):
+        """
+        Feeds the bytes of a file from the progress offset up to end into the
+        progress
+        :param filename:
+        :param progress:
+        :param end:
+        :return:
+        """
+        with self.block.open(filename, "rb") as fd:
+            fd.seek(progress.offset)
+            while progress.offset < end:
+                _bytes = fd.read(min(1024 * 1024, end - progress.offset))
+                if not _bytes:
+                    break
+                progress.update(_bytes)
+
+
+def _key(entry: dict) -> Tuple[str, str]:
+    """
+    Manifest entries are keyed on the source and target path
+    :param entry:
+    :return:
+    """
+    return entry["source"], entry["target"]
+
+
+def _partial_entry(key: Tuple[str, str], progress) -> dict:
+    """
+    Serialises a partial entry, which is either live progress or an entry
+    loaded from an earlier attempt that has not been resumed yet
+    :param key:
+    :param progress:
+    :return:
+    """
+    if isinstance(progress, dict):
+        return progress
+    return dict(
+        source=key[0], target=key[1], offset=progress.offset, crc32=progress.crc32
+    )
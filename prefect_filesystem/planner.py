@@ -0,0 +1,113 @@
+"""
+Size aware scheduling of the files copied by filesystem_copy
+"""
+
+import time
+from typing import List
+
+from prefect_filesystem.utlity import file_infos, map_concurrently
+
+schedules = {"largest_first", "bin_pack"}
+
+
+class TransferPlan:
+    """
+    Schedules files across concurrency slots from their sizes, placing each
+    file, largest first, in the least loaded slot. With "largest_first" the
+    files are started in that order as slots become free, whereas "bin_pack"
+    runs each slot's files one after another as planned.
+
+    The ideal makespan is worked out after the plan has run: the load of the
+    busiest slot, converted to seconds with the average throughput measured
+    during the run. It is the time the copy would have taken had every slot
+    moved bytes at that rate, a hindsight measure of how evenly the plan spread
+    the load rather than a forecast
+    """
+
+    def __init__(self, items: list, sizes: List[int], slots: int, strategy: str):
+        if strategy not in schedules:
+            raise Exception(f"Unknown schedule {strategy}")
+        self.items = items
+        self.sizes = sizes
+        self.strategy = strategy
+        self.order = sorted(range(len(items)), key=lambda n: -sizes[n])
+        self.slots = [[] for _ in range(max(1, min(slots, len(items))))]
+        self.loads = [0] * len(self.slots)
+        for n in self.order:
+            slot = self.loads.index(min(self.loads))
+            self.slots[slot].append(n)
+            self.loads[slot] += sizes[n]
+        self.busy_seconds = 0.0
+
+    @classmethod
+    async def create(
+        cls, block, items: list, slots: int, strategy: str
+    ) -> "TransferPlan":
+        """
+        Plans the (source, target) items, looking up the source sizes in
+        batches
+        :param block:
+        :param items:
+        :param slots:
+        :param strategy:
+        :return:
+        """
+        infos = await file_infos(block, [i.path for i, _ in items], slots)
+        sizes = [(info or {}).get("size") or 0 for info in infos]
+        return cls(items, sizes, slots, strategy)
+
+    @property
+    def ideal_makespan(self) -> float:
+        """
+        Seconds the busiest slot takes at the throughput measured by run
+        :return:
+        """
+        total = sum(self.sizes)
+        if not total:
+            return 0.0
+        return max(self.loads) * self.busy_seconds / total
+
+    async def run(self, fn, args: list, on_result=None) -> list:
+        """
+        Awaits fn(*args[n]) for every planned item n. Results are returned in
+        the order of the items, unless on_result is supplied, in which case each
+        result is passed to it as it completes and nothing is retained
+        :param fn:
+        :param args:
+        :param on_result:
+        :return:
+        """
+        results = [None] * len(args)
+
+        async def _run(n):
+            """
+            Runs and times a single item
+            :param n:
+            :return:
+            """
+            started = time.monotonic()
+            try:
+                result = await fn(*args[n])
+            finally:
+                self.busy_seconds += time.monotonic() - started
+            if on_result is None:
+                results[n] = result
+            else:
+                await on_result(result)
+
+        async def _run_slot(slot):
+            """
+            Runs the items of a slot one after another
+            :param slot:
+            :return:
+            """
+            for n in slot:
+                await _run(n)
+
+        if self.strategy == "largest_first":
+            await map_concurrently(_run, [(n,) for n in self.order], len(self.slots))
+        else:
+            await map_concurrently(
+                _run_slot, [(slot,) for slot in self.slots], len(self.slots)
+            )
+        return [] if on_result is not None else results
@@ -0,0 +1,187 @@
+"""
+Token bucket rate limits attached to filesystem blocks
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from prefect_filesystem.file_wrapper import FileWrapper
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second up to capacity. Tokens may
+    be taken on credit, the caller then sleeping until the debt is repaid, so
+    requests larger than the capacity are still served at the average rate.
+    Buckets are shared by the worker threads reading and writing files
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float):
+        """
+        Takes tokens from the bucket, sleeping while it is in debt
+        :param tokens:
+        :return:
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= tokens
+            debt = -self.tokens
+        if debt > 0:
+            time.sleep(debt / self.rate)
+
+
+class RateLimit:
+    """
+    Limits the bytes per second read and written, and the files opened per
+    second, through the blocks it is attached to. Up to burst seconds worth of
+    each may be used at once after a quiet period. Bytes are counted as stored,
+    beneath any compression
+    """
+
+    def __init__(
+        self,
+        bytes_per_second: Optional[float] = None,
+        opens_per_second: Optional[float] = None,
+        burst: float = 1.0,
+    ):
+        self.bytes = (
+            TokenBucket(bytes_per_second, bytes_per_second * burst)
+            if bytes_per_second
+            else None
+        )
+        self.opens = (
+            TokenBucket(opens_per_second, max(1.0, opens_per_second * burst))
+            if opens_per_second
+            else None
+        )
+
+    def opened(self):
+        """
+        Accounts for a file being opened
+        :return:
+        """
+        if self.opens:
+            self.opens.acquire(1)
+
+    def transferred(self, size: int):
+        """
+        Accounts for size bytes read or written
+        :param size:
+        :return:
+        """
+        if self.bytes and size:
+            self.bytes.acquire(size)
+
+
+class RateLimitedFile(FileWrapper):
+    """
+    Wraps a stored binary file, pacing its reads and writes by a RateLimit
+    """
+
+    def __init__(self, f, limit: RateLimit):
+        super().__init__(f)
+        self.limit = limit
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        _bytes = self.f.read(size)
+        self.limit.transferred(len(_bytes))
+        return _bytes
+
+    def read1(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        _bytes = self.f.read1(size)
+        self.limit.transferred(len(_bytes))
+        return _bytes
+
+    def readinto(self, b):
+        """
+
+        :param b:
+        :return:
+        """
+        n = self.f.readinto(b)
+        self.limit.transferred(n or 0)
+        return n
+
+    def readline(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        line = self.f.readline(size)
+        self.limit.transferred(len(line))
+        return line
+
+    def write(self, _bytes):
+        """
+
+        :param _bytes:
+        :return:
+        """
+        self.limit.transferred(len(_bytes))
+        return self.f.write(_bytes)
+
+
+_type_limits: Dict[type, RateLimit] = {}
+_instance_limits: Dict[int, Tuple[object, RateLimit]] = {}
+
+
+def set_rate_limit(block, limit: Optional[RateLimit]):
+    """
+    Attaches limit to a block instance, or to every block of a type when block
+    is a class, replacing any limit already attached. None removes the limit.
+    Blocks are not changed, so limits are not saved with them nor passed to
+    worker processes. Pydantic blocks cannot be weakly referenced, so a block
+    instance is kept alive until its limit is removed
+    :param block:
+    :param limit:
+    :return:
+    """
+    if isinstance(block, type):
+        if limit is None:
+            _type_limits.pop(block, None)
+        else:
+            _type_limits[block] = limit
+        return
+
+    if limit is None:
+        _instance_limits.pop(id(block), None)
+    else:
+        _instance_limits[id(block)] = (block, limit)
+
+
+def rate_limit_for(block) -> Optional[RateLimit]:
+    """
+    The limit attached to the block instance, or otherwise to its type
+    :param block:
+    :return:
+    """
+    entry = _instance_limits.get(id(block))
+    if entry is not None and entry[0] is block:
+        return entry[1]
+    for cls in type(block).__mro__:
+        if cls in _type_limits:
+            return _type_limits[cls]
+    return None
@@ -0,0 +1,259 @@
+"""
+Staging area used by filesystem_copy to hold files between the source and the
+target filesystem
+"""
+
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from tempfile import TemporaryDirectory
+from typing import Dict, Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.memory import MemoryFile, MemoryFileSystem
+from prefect.utilities.asyncutils import run_sync_in_worker_thread
+
+from prefect_filesystem.abstract_block import AbstractBlock
+from prefect_filesystem.abstract_local_filesystem import AbstractLocalFileSystem
+from prefect_filesystem.file_wrapper import FileWrapper
+
+
+class _MemoryFileSystem(MemoryFileSystem):
+    """
+    Memory filesystem handing out an independent handle on every read, as
+    fsspec shares a single handle between all readers of a memory file, which
+    concurrent ranged reads would otherwise race on
+    """
+
+    def _open(self, path, mode="rb", **kwargs):
+        """
+
+        :param path:
+        :param mode:
+        :param kwargs:
+        :return:
+        """
+        f = super()._open(path, mode, **kwargs)
+        if mode == "rb":
+            return MemoryFile(self, self._strip_protocol(path), f.getvalue())
+        return f
+
+
+class MemoryStage(AbstractBlock):
+    """
+    Block holding staged files in memory, under a root of its own within the
+    process wide fsspec memory filesystem. Files written while staging is set
+    are accounted against its memory budget, and spill to its disk tier once
+    they outgrow it
+    """
+
+    def __init__(self, staging: Optional["StagingArea"] = None):
+        self.root = f"/stage-{uuid.uuid4()}"
+        self.staging = staging
+
+    @property
+    def basepath(self) -> str:
+        """
+
+        :return:
+        """
+        return f"memory://{self.root}"
+
+    @property
+    def filesystem(self) -> AbstractFileSystem:
+        """
+
+        :return:
+        """
+        return _MemoryFileSystem()
+
+    def open(self, filepath: str, mode: str = "rb", wrap=None, **kwargs):
+        """
+        Opens a staged file, writing it through a _SpillingFile beneath any
+        compression and wrap
+        :param filepath:
+        :param mode:
+        :param wrap:
+        :param kwargs:
+        :return:
+        """
+        if self.staging is not None and ("w" in mode or "a" in mode):
+            spill = partial(_SpillingFile, self.staging, filepath)
+            wrap = spill if wrap is None else _after(spill, wrap)
+        return super().open(filepath, mode, wrap=wrap, **kwargs)
+
+    def clear(self):
+        """
+        Drops every file held by the stage
+        :return:
+        """
+        fs = self.filesystem
+        if fs.exists(self.root):
+            fs.rm(self.root, recursive=True)
+
+
+def _after(first, then):
+    """
+    Wrapper applying first and then then
+    :param first:
+    :param then:
+    :return:
+    """
+    return lambda f: then(first(f))
+
+
+class _SpillingFile(FileWrapper):
+    """
+    Stored file of a file staged in memory, which counts the bytes written
+    against the staging area's budget. Once the file would exceed the memory
+    threshold or the remaining budget, its bytes move to the disk tier and the
+    rest of the file is written there
+    """
+
+    def __init__(self, staging: "StagingArea", filename: str, f):
+        super().__init__(f)
+        self.staging = staging
+        self.filename = filename
+        self.size = f.tell()
+        self.spilled = False
+
+    def write(self, _bytes):
+        """
+
+        :param _bytes:
+        :return:
+        """
+        end = self.f.tell() + len(_bytes)
+        if not self.spilled and end > self.size:
+            if not self.staging.charge(self.filename, end - self.size):
+                self._spill()
+        self.size = max(self.size, end)
+        return self.f.write(_bytes)
+
+    def _spill(self):
+        """
+        Moves the bytes written so far to the disk tier, keeping the position
+        :return:
+        """
+        position = self.f.tell()
+        data = self.f.getvalue()
+        self.f.close()
+        self.staging.spill(self.filename)
+        self.f = self.staging.disk.open(self.filename, "wb")
+        self.f.write(data)
+        self.f.seek(position)
+        self.spilled = True
+
+
+class StagingArea:
+    """
+    Hybrid staging area. Files are staged in memory while each stays within
+    memory_threshold bytes and all of them within memory_budget bytes, counted
+    as they are written. A file outgrowing either spills to disk, in a
+    temporary directory under directory (e.g. /dev/shm) when set
+    """
+
+    def __init__(
+        self,
+        disk: AbstractBlock,
+        memory_threshold: int = 0,
+        memory_budget: int = 64 * 1024 * 1024,
+    ):
+        self.disk = disk
+        self.memory = MemoryStage(self)
+        self.memory_threshold = memory_threshold
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self._reserved: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def make_temp(cls, directory: Optional[str] = None, **kwargs):
+        """
+        Creates a staging area whose disk tier is a temporary directory, and
+        removes every staged file on exit
+        :param directory:
+        :param kwargs:
+        :return:
+        """
+        with TemporaryDirectory(dir=directory) as tmp_dir:
+            staging = cls(
+                AbstractLocalFileSystem(root_path=tmp_dir, auto_mkdir=True), **kwargs
+            )
+            try:
+                yield staging
+            finally:
+                staging.memory.clear()
+
+    def reserve(self, filename: str, size: Optional[int] = None) -> AbstractBlock:
+        """
+        Picks the tier to start staging filename in and returns its block.
+        size, when known, is the expected size of the staged file, and files
+        expected to exceed the memory threshold go straight to disk
+        :param filename:
+        :param size:
+        :return:
+        """
+        if (
+            self.memory_threshold
+            and (size is None or size <= self.memory_threshold)
+            and self.memory_used < self.memory_budget
+        ):
+            self._reserved[filename] = 0
+            return self.memory
+        return self.disk
+
+    def charge(self, filename: str, size: int) -> bool:
+        """
+        Accounts for size more bytes of a file staged in memory, unless they
+        would exceed the memory threshold or budget
+        :param filename:
+        :param size:
+        :return:
+        """
+        with self._lock:
+            used = self._reserved[filename] + size
+            if used > self.memory_threshold or (
+                self.memory_used + size > self.memory_budget
+            ):
+                return False
+            self._reserved[filename] = used
+            self.memory_used += size
+            return True
+
+    def spill(self, filename: str):
+        """
+        Moves filename from the memory to the disk tier, freeing its memory
+        :param filename:
+        :return:
+        """
+        with self._lock:
+            self.memory_used -= self._reserved.pop(filename)
+        fs = self.memory.filesystem
+        path = self.memory.build_path(filename)
+        if fs.exists(path):
+            fs.rm(path)
+
+    def tier(self, filename: str) -> AbstractBlock:
+        """
+        Block holding the staged filename
+        :param filename:
+        :return:
+        """
+        return self.memory if filename in self._reserved else self.disk
+
+    async def release(self, filename: str):
+        """
+        Removes a published file from the staging area
+        :param filename:
+        :return:
+        """
+        block = self.tier(filename)
+        fs = block._resolve_abstract_filesystem()
+        path = block.build_path(filename)
+        if await run_sync_in_worker_thread(fs.exists, path):
+            await run_sync_in_worker_thread(fs.rm, path)
+        with self._lock:
+            self.memory_used -= self._reserved.pop(filename, 0)
@@ -2,15 +2,47 @@
 Provides a collection of filesystem tasks
 """
 
+import asyncio
 import json
-from typing import Any, Callable, Optional, Union
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from functools import partial, reduce
+from typing import Any, Callable, List, Optional, Tuple, Type, Union
 
+import anyio
 from prefect import get_run_logger, task
 from prefect.blocks.core import Block
 from prefect.utilities.asyncutils import run_sync_in_worker_thread
 
-from .abstract_local_filesystem import AbstractLocalFileSystem
-from .utlity import CompressionType, apply_path_format, copy_filesystem, ensure_abstract
+from .archive import ArchiveWriter, StreamingZipReader, Unseekable
+from .compression import is_passthrough, requires_staging
+from .digest import DigestingFile, Digests
+from .manifest import CopyManifest, FileProgress
+from .planner import TransferPlan
+from .staging import StagingArea
+from .utlity import (
+    AdaptiveBlockSize,
+    BlockSize,
+    CompressionType,
+    CopySummary,
+    CopyTotals,
+    FileStats,
+    PathFormat,
+    RetryingFile,
+    apply_path_format,
+    copy_file_fast,
+    copy_file_multipart,
+    copy_filesystem,
+    copy_filesystem_many,
+    ensure_abstract,
+    file_infos,
+    is_unchanged,
+    iterate_in_thread,
+    map_concurrently,
+)
 
 
 @task
@@ -102,15 +134,134 @@ async def filesystem_get(
 async def filesystem_copy(
     source_filename: str,
     source_filesystem: Block,
-    target_filesystem: str,
-    target_filename: str = None,
+    target_filesystem: Union[Block, List[Block]],
+    target_filename: Union[str, List[str]] = None,
     source_compression: Union[str, CompressionType] = None,
-    target_compression: Union[str, CompressionType] = None,
+    target_compression: Union[str, CompressionType, list] = None,
     datasource: Optional[Any] = None,
-    block_size=1024 * 1024,
-) -> list:
+    block_size: Union[int, str] = 1024 * 1024,
+    max_concurrency: int = 1,
+    stage: bool = True,
+    read_ahead: int = 0,
+    multipart_threshold: Optional[int] = None,
+    multipart_parts: int = 4,
+    return_summary: Union[bool, str] = False,
+    manifest: Optional[str] = None,
+    manifest_interval: float = 10.0,
+    skip_unchanged: Optional[str] = None,
+    min_block_size: int = 64 * 1024,
+    max_block_size: int = 16 * 1024 * 1024,
+    artifact_key: Optional[str] = None,
+    source_glob: Optional[str] = None,
+    window: Optional[int] = None,
+    stage_memory_threshold: int = 0,
+    stage_memory_budget: int = 64 * 1024 * 1024,
+    stage_dir: Optional[str] = None,
+    digests: Optional[List[str]] = None,
+    digest_sidecars: bool = False,
+    max_processes: Optional[int] = None,
+    target_archive: Optional[str] = None,
+    archive_type: str = "zip",
+    retries: int = 0,
+    retry_backoff: float = 1.0,
+    retry_on: Optional[Tuple[Type[BaseException], ...]] = None,
+    schedule: Optional[str] = None,
+    source_archive: Optional[str] = None,
+) -> Union[list, CopySummary]:
     """
-    Copies data from the source filesystem into the target filesystem
+    Copies data from the source filesystem into the target filesystem. Up to
+    max_concurrency files are staged (and then published) at the same time.
+
+    Files are taken from datasource, which may be a dict, an iterable or an
+    async iterable of dicts (e.g. rows streamed from a cursor), or from the files
+    of the source filesystem matching source_glob (e.g. "inbound/2026-*/**/*.csv")
+    whose rows hold the relative "path", "name" and "size" of each file. Either
+    is consumed lazily, so copying starts while the rows are still being read.
+    Staged copies stage and publish window files at a time when window is set,
+    rather than staging everything before publishing.
+
+    Staged files are held in a temporary directory under stage_dir, which
+    defaults to the system temporary directory and may point at a tmpfs such
+    as /dev/shm. Staged files of up to stage_memory_threshold bytes are held in
+    memory instead, as long as they fit within stage_memory_budget bytes,
+    saving the disk round trip for small files. The bytes are counted as they
+    are written, and a file outgrowing either limit spills to disk.
+
+    When stage is False each file is streamed from the source straight into the
+    target, only falling back to the local staging area when the target
+    compression needs a seekable file (e.g. zip writes).
+
+    block_size="auto" tunes the block size of each file between min_block_size
+    and max_block_size from the measured throughput. read_ahead sets how many
+    blocks may be read ahead of the writer, so source reads overlap target
+    writes.
+
+    Files of at least multipart_threshold bytes that are copied without
+    re-encoding into a local stage or target are fetched as multipart_parts
+    concurrent byte ranges.
+
+    manifest names a checkpoint file on the target filesystem, saved every
+    manifest_interval seconds and when the copy fails. A retry skips the files
+    it lists as completed and, when streaming without re-encoding, appends to
+    partially copied files. It is removed once the copy succeeds.
+
+    skip_unchanged ("size_mtime" or "size_checksum") looks up the source and
+    target files before copying and skips those whose target is current.
+
+    digests names the algorithms (e.g. ["sha256"], "md5", "crc32", or "xxh64"
+    when xxhash is installed) used to digest the stored source, the payload and
+    the stored target while they are copied, which are reported in the summary.
+    With digest_sidecars a "<target>.<algorithm>" file in sha256sum format is
+    written next to each target.
+
+    Decoding and encoding is CPU bound and holds the GIL for much of the time.
+    With max_processes set, files that change compression are streamed in a
+    pool of that many worker processes instead, so concurrent copies scale
+    across cores. The blocks must then be picklable.
+
+    A source read failing with one of the retry_on exception types (by default
+    those of retryable_errors, which include paramiko's SSHException) is
+    retried up to retries times after waiting retry_backoff seconds, doubled on
+    each further attempt. Each retry reconnects and reopens the stored file at
+    the stored byte that failed, beneath any decompression, so a transient
+    fault does not restart the whole file.
+
+    schedule ("largest_first" or "bin_pack") looks up the source sizes up
+    front, which reads the whole datasource (or window) first, and plans the
+    files across the max_concurrency slots with the largest files first, so a
+    large file does not start last. "largest_first" starts the files in that
+    order as slots free up, "bin_pack" runs the planned slots as they are. The
+    totals then include the ideal_makespan: the seconds the busiest slot would
+    take at the throughput measured during the copy. It is computed afterwards,
+    so compare it with the actual seconds to see how evenly the plan spread the
+    load, not as a forecast.
+
+    target_filesystem may also be a list of blocks, with target_filename and
+    target_compression either shared or given per target. Each source file is
+    then read and decoded once and streamed into every target at the pace of
+    the slowest, and zip targets are written as a stream rather than staged.
+    Fan-out copies report stats per target, with its target_index, including
+    any digests, but cannot be run in worker processes.
+
+    target_archive packs every file into a single archive on the target
+    filesystem instead, of archive_type "zip", "tar", "tar:gz", "tar:bz2" or
+    "tar:xz", with target_filename naming each member. Members are streamed
+    into the archive in datasource order as they are read, so nothing is
+    staged, although tar members of compressed sources are spooled to learn
+    their size. Archives are written in one pass, so cannot be combined with
+    manifest or skip_unchanged.
+
+    source_archive names a zip archive on the source filesystem to unpack
+    instead. It is read in a single sequential pass over its local headers,
+    never seeking, and the members whose path matches the source_filename
+    glob (e.g. "*" or "data/*.csv") are streamed into target_filename, which is
+    formatted with the "path", "name" and "size" of each member.
+
+    Returns the (source, target) paths copied, or a CopySummary with per file
+    statistics, the skipped files and totals when return_summary is set. For
+    long datasources, return_summary="totals" keeps only running totals rather
+    than a list of every file. The statistics are also published as a table
+    artifact when artifact_key is set
     :param source_filename:
     :param source_filesystem:
     :param target_filesystem:
@@ -119,46 +270,1265 @@ async def filesystem_copy(
     :param target_compression:
     :param datasource:
     :param block_size:
+    :param max_concurrency:
+    :param stage:
+    :param read_ahead:
+    :param multipart_threshold:
+    :param multipart_parts:
+    :param return_summary:
+    :param manifest:
+    :param manifest_interval:
+    :param skip_unchanged:
+    :param min_block_size:
+    :param max_block_size:
+    :param artifact_key:
+    :param source_glob:
+    :param window:
+    :param stage_memory_threshold:
+    :param stage_memory_budget:
+    :param stage_dir:
+    :param digests:
+    :param digest_sidecars:
+    :param max_processes:
+    :param target_archive:
+    :param archive_type:
+    :param retries:
+    :param retry_backoff:
+    :param retry_on:
+    :param schedule:
+    :param source_archive:
     :return:
     """
     logger = get_run_logger()
+    started = time.monotonic()
 
     source_filesystem = ensure_abstract(source_filesystem)
-    target_filesystem = ensure_abstract(target_filesystem)
-
     target_filename = target_filename or source_filename
+    if isinstance(digests, str):
+        digests = [digests]
 
-    with AbstractLocalFileSystem.make_temp(auto_mkdir=True) as stage_fs:
-        resolved_names = [
-            (
-                apply_path_format(source_metadata, source_filename, source_compression),
-                apply_path_format(source_metadata, target_filename, target_compression),
+    fan_out = isinstance(target_filesystem, (list, tuple))
+    if fan_out:
+        if manifest or skip_unchanged or target_archive or max_processes:
+            raise Exception(
+                "manifest, skip_unchanged, target_archive and max_processes need a "
+                "single target"
             )
-            for source_metadata in _as_iterable(datasource)
-        ]
+        target_filesystem = [ensure_abstract(t) for t in target_filesystem]
+        target_filename = _per_target(target_filename, len(target_filesystem))
+        target_compression = _per_target(target_compression, len(target_filesystem))
+    else:
+        target_filesystem = ensure_abstract(target_filesystem)
+    if target_archive and (manifest or skip_unchanged):
+        raise Exception(
+            "manifest and skip_unchanged cannot be used with target_archive"
+        )
+    if source_archive and (fan_out or target_archive or manifest or skip_unchanged):
+        raise Exception(
+            "source_archive needs a single target and no manifest, skip_unchanged "
+            "or target_archive"
+        )
 
-        if len(resolved_names) == 0:
-            logger.info("Nothing to do")
-            return []
+    copy_options = dict(
+        block_size=block_size,
+        min_block_size=min_block_size,
+        max_block_size=max_block_size,
+        read_ahead=read_ahead,
+        multipart_threshold=multipart_threshold,
+        multipart_parts=multipart_parts,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        retry_on=retry_on,
+    )
+
+    if manifest:
+        manifest = await CopyManifest.load(
+            target_filesystem, manifest, interval=manifest_interval
+        )
+
+    if source_glob is not None:
+        datasource = source_filesystem.iter_files(source_glob)
+
+    with _process_pool(max_processes) as executor, StagingArea.make_temp(
+        stage_dir,
+        memory_threshold=stage_memory_threshold,
+        memory_budget=stage_memory_budget,
+    ) as staging:
+        copy_options["executor"] = executor
+        resolved_names = _resolve_names(
+            datasource,
+            source_filename,
+            source_compression,
+            target_filename,
+            target_compression,
+        )
+
+        report = _CopyReport(
+            source_filesystem,
+            target_filesystem,
+            max_concurrency,
+            measure=bool(return_summary or artifact_key),
+            keep_skipped=return_summary != "totals",
+        )
+        if skip_unchanged:
+            resolved_names = _drop_unchanged(
+                source_filesystem,
+                target_filesystem,
+                resolved_names,
+                skip_unchanged,
+                max_concurrency,
+                report.skip,
+            )
+
+        async def _completed(i, o):
+            """
+            Returns stats for a file the manifest records as already copied
+            :param i:
+            :param o:
+            :return:
+            """
+            if manifest and await manifest.is_complete(i.path, o.path):
+                logger.info(f"Already copied {i.path}")
+                return FileStats(source=i.path, target=o.path, status="resumed")
 
-        for i, o in resolved_names:
+        async def _stage(i, o):
+            """
+            Copies the source file into the staging area
+            :param i:
+            :param o:
+            :return:
+            """
+            stats = await _completed(i, o)
+            if stats:
+                return stats
             logger.info(f"Staging {i.path}")
-            await copy_filesystem(
-                source_filesystem.open_async(i.path, "rb", compression=i.compression),
-                stage_fs.open_async(o.path, "wb", compression=o.compression),
-                block_size=block_size,
+            passthrough = is_passthrough(i.compression, o.compression, i.path, o.path)
+            if executor is None or passthrough:
+                # The size is a hint, files spill to disk as they outgrow memory
+                stage = staging.reserve(o.path, i.size if passthrough else None)
+            else:
+                # Worker processes cannot reach the in memory stage
+                stage = staging.disk
+            return await _transfer(
+                source_filesystem,
+                i,
+                stage,
+                o,
+                progress=FileProgress() if manifest else None,
+                digests=digests,
+                **copy_options,
+            )
+
+        async def _publish(stats):
+            """
+            Copies the staged file into the target filesystem
+            :param stats:
+            :return:
+            """
+            if stats["status"] == "resumed":
+                return
+            logger.info(f"Copying to {stats['target']}")
+            published = await _transfer(
+                staging.tier(stats["target"]),
+                PathFormat(stats["target"], None),
+                target_filesystem,
+                PathFormat(stats["target"], None),
+                **copy_options,
+            )
+            stats["stage_seconds"] = stats["seconds"]
+            stats["publish_seconds"] = published["seconds"]
+            stats["seconds"] += published["seconds"]
+            await staging.release(stats["target"])
+            if digest_sidecars:
+                await _write_sidecars(target_filesystem, stats)
+            if manifest:
+                await manifest.complete(
+                    stats["source"], stats["target"], stats.get("crc32")
+                )
+
+        async def _stream(i, o):
+            """
+            Copies the source file directly into the target filesystem
+            :param i:
+            :param o:
+            :return:
+            """
+            if requires_staging(o.compression):
+                stats = await _stage(i, o)
+                await _publish(stats)
+                return stats
+
+            stats = await _completed(i, o)
+            if stats:
+                return stats
+
+            progress = None
+            if manifest and is_passthrough(
+                i.compression, o.compression, i.path, o.path
+            ):
+                progress = await manifest.resume_point(i.path, o.path)
+                manifest.track(i.path, o.path, progress)
+            elif manifest:
+                progress = FileProgress()
+
+            logger.info(f"Streaming {i.path} to {o.path}")
+            stats = await _transfer(
+                source_filesystem,
+                i,
+                target_filesystem,
+                o,
+                progress=progress,
+                digests=digests,
+                **copy_options,
+            )
+            if digest_sidecars:
+                await _write_sidecars(target_filesystem, stats)
+            if manifest:
+                await manifest.complete(i.path, o.path, stats.get("crc32"))
+            return stats
+
+        async def _pack(on_result):
+            """
+            Streams every file into a single archive on the target
+            :param on_result:
+            :return:
+            """
+            logger.info(f"Packing into {target_archive}")
+            results = []
+            archive = await run_sync_in_worker_thread(
+                target_filesystem.open, target_archive, "wb"
+            )
+            try:
+                writer = ArchiveWriter(archive, archive_type)
+                async for i, o in resolved_names:
+                    stats = await _add_member(
+                        writer,
+                        source_filesystem,
+                        i,
+                        o.path,
+                        max_block_size if block_size == "auto" else block_size,
+                    )
+                    if on_result is None:
+                        results.append(stats)
+                    else:
+                        await on_result(stats)
+                await run_sync_in_worker_thread(writer.close)
+            finally:
+                await run_sync_in_worker_thread(archive.close)
+            return results
+
+        async def _unpack(on_result):
+            """
+            Streams the matching members of the source archive into the target
+            :param on_result:
+            :return:
+            """
+            logger.info(f"Unpacking {source_archive}")
+            results = []
+            archive = await run_sync_in_worker_thread(
+                source_filesystem.open, source_archive, "rb"
+            )
+            try:
+                reader = StreamingZipReader(archive)
+                while True:
+                    member = await run_sync_in_worker_thread(reader.next)
+                    if member is None:
+                        break
+                    if member.is_dir() or not fnmatchcase(member.name, source_filename):
+                        continue
+                    row = dict(
+                        path=member.name,
+                        name=member.name.rsplit("/", 1)[-1],
+                        size=member.size,
+                    )
+                    o = apply_path_format(row, target_filename, target_compression)
+                    stats = await _extract_member(
+                        member,
+                        target_filesystem,
+                        o,
+                        _block_size(block_size, min_block_size, max_block_size),
+                        read_ahead,
+                    )
+                    if on_result is None:
+                        results.append(stats)
+                    else:
+                        await on_result(stats)
+            finally:
+                await run_sync_in_worker_thread(archive.close)
+            return results
+
+        async def _fan_out(i, outputs):
+            """
+            Streams the source file into every target, reading it once
+            :param i:
+            :param outputs:
+            :return:
+            """
+            logger.info(f"Streaming {i.path} to {len(outputs)} targets")
+            started = time.monotonic()
+            source_digests = Digests(digests) if digests and i.compression else None
+            target_digests = [
+                Digests(digests) if digests and o.compression else None for o in outputs
+            ]
+            retried = dict(retries=0)
+            copied = await copy_filesystem_many(
+                _open_at(
+                    source_filesystem,
+                    i,
+                    0,
+                    source_digests,
+                    _retrying(
+                        source_filesystem,
+                        i,
+                        retries,
+                        retry_backoff,
+                        retry_on,
+                        retried,
+                    ),
+                ),
+                [
+                    target.open_async(
+                        o.path,
+                        "wb",
+                        compression=o.compression,
+                        wrap=_fan_out_wrap(o, d),
+                    )
+                    for target, o, d in zip(target_filesystem, outputs, target_digests)
+                ],
+                block_size=_block_size(block_size, min_block_size, max_block_size),
+                read_ahead=read_ahead,
+                digests=digests,
+            )
+            seconds = time.monotonic() - started
+            results = []
+            for n, (o, stats) in enumerate(zip(outputs, copied)):
+                stats = FileStats(
+                    source=i.path,
+                    target=o.path,
+                    target_index=n,
+                    status="copied",
+                    parts=1,
+                    seconds=seconds,
+                    **stats,
+                )
+                stats["retries"] = retried["retries"]
+                if digests:
+                    _add_stored_digests(stats, source_digests, target_digests[n])
+                if digest_sidecars:
+                    await _write_sidecars(target_filesystem[n], stats)
+                results.append(stats)
+            return results
+
+        plans = []
+
+        async def _plan(names):
+            """
+            Plans the names by size
+            :param names:
+            :return:
+            """
+            plan = await TransferPlan.create(
+                source_filesystem,
+                names if isinstance(names, list) else [n async for n in names],
+                max_concurrency,
+                schedule,
+            )
+            plans.append(plan)
+            return plan
+
+        async def _map(fn, names, on_result):
+            """
+            Maps fn over the names, as planned when a schedule is set
+            :param fn:
+            :param names:
+            :param on_result:
+            :return:
+            """
+            if not schedule:
+                return await map_concurrently(fn, names, max_concurrency, on_result)
+            plan = await _plan(names)
+            return await plan.run(fn, plan.items, on_result)
+
+        async def _copy_all(on_result):
+            """
+            Copies every file, streamed or staged window by window
+            :param on_result:
+            :return:
+            """
+            if target_archive:
+                return await _pack(on_result)
+            if source_archive:
+                return await _unpack(on_result)
+            if fan_out:
+                copied = await _map(
+                    _fan_out,
+                    resolved_names,
+                    None if on_result is None else partial(_each, on_result),
+                )
+                return [stats for file_stats in copied for stats in file_stats]
+            if not stage:
+                return await _map(_stream, resolved_names, on_result)
+
+            results = []
+            windows = (
+                _batches(resolved_names, window) if window else _one(resolved_names)
+            )
+            async for names in windows:
+                if schedule:
+                    plan = await _plan(names)
+                    staged = await plan.run(_stage, plan.items)
+                    await plan.run(_publish, [(s,) for s in staged])
+                else:
+                    staged = await map_concurrently(_stage, names, max_concurrency)
+                    await map_concurrently(
+                        _publish, [(s,) for s in staged], max_concurrency
+                    )
+                for stats in staged:
+                    if on_result is None:
+                        results.append(stats)
+                    else:
+                        await on_result(stats)
+            return results
+
+        keep_files = return_summary != "totals"
+        on_result = None if keep_files else report.add
+        if manifest:
+            stats = await _run_checkpointed(manifest, partial(_copy_all, on_result))
+        else:
+            stats = await _copy_all(on_result)
+
+        for f in stats:
+            await report.add(f)
+        totals = await report.close(time.monotonic() - started)
+        if plans:
+            totals["ideal_makespan"] = sum(p.ideal_makespan for p in plans)
+            logger.info(
+                f"Ideal makespan at the measured throughput "
+                f"{totals['ideal_makespan']:.2f}s, actual {totals['seconds']:.2f}s"
+            )
+
+        if totals["skipped"]:
+            logger.info(f"Skipped {totals['skipped']} unchanged items")
+        if not totals["files"]:
+            logger.info("Nothing to do")
+        else:
+            logger.info(f"Copied {totals['files']} items")
+
+        if report.measure:
+            logger.info(f"Copy totals {totals}")
+        if artifact_key:
+            await _create_artifact(artifact_key, stats, totals)
+        if return_summary:
+            return CopySummary(
+                files=stats if keep_files else None,
+                skipped=report.skipped if keep_files else None,
+                totals=totals,
+            )
+        return [(f["source"], f["target"]) for f in stats]
+
+
+class _CopyReport:
+    """
+    Accumulates CopyTotals from per file stats as they complete. When measuring,
+    the stored source and target sizes are looked up in batches and added to
+    each file's stats. target is a list of blocks for fan-out copies
+    """
+
+    def __init__(self, source, target, concurrency, measure, keep_skipped):
+        self.source = source
+        self.target = target
+        self.concurrency = concurrency
+        self.measure = measure
+        self.skipped = [] if keep_skipped else None
+        self.totals = CopyTotals(
+            files=0,
+            skipped=0,
+            bytes_in=0,
+            bytes_out=0,
+            bytes=0,
+            retries=0,
+            seconds=0.0,
+        )
+        self._pending = []
+
+    def skip(self, stats: FileStats):
+        """
+        Counts a file skipped as unchanged
+        :param stats:
+        :return:
+        """
+        self.totals["skipped"] += 1
+        if self.skipped is not None:
+            self.skipped.append(stats)
+
+    async def add(self, stats: FileStats):
+        """
+        Counts a copied file
+        :param stats:
+        :return:
+        """
+        self._pending.append(stats)
+        if len(self._pending) >= 256:
+            await self._flush()
+
+    async def close(self, seconds: float) -> CopyTotals:
+        """
+        Completes the totals for a copy that took seconds
+        :param seconds:
+        :return:
+        """
+        await self._flush()
+        totals = self.totals
+        totals["seconds"] = seconds
+        if totals["bytes_in"]:
+            totals["compression_ratio"] = totals["bytes_out"] / totals["bytes_in"]
+        if seconds:
+            totals["throughput"] = totals["bytes_in"] / seconds
+        return totals
+
+    async def _flush(self):
+        """
+        Measures and accumulates the pending stats
+        :return:
+        """
+        pending, self._pending = self._pending, []
+        if self.measure and pending:
+            targets = self.target if isinstance(self.target, list) else [self.target]
+            for n, target in enumerate(targets):
+                stats = [f for f in pending if f.get("target_index", 0) == n]
+                await _measure(self.source, target, stats, self.concurrency)
+        for f in pending:
+            self.totals["files"] += 1
+            for key in ("bytes_in", "bytes_out", "bytes", "retries"):
+                self.totals[key] += f.get(key) or 0
+
+
+async def _resolve_names(
+    datasource, source_filename, source_compression, target_filename, target_compression
+):
+    """
+    Lazily formats the source and target of each datasource row, or the list
+    of targets when target_filename is a list. Rows of a sync iterable are
+    pulled in a worker thread, as iterating a listing or cursor may block
+    :param datasource:
+    :param source_filename:
+    :param source_compression:
+    :param target_filename:
+    :param target_compression:
+    :return:
+    """
+    datasource = _as_iterable(datasource)
+    if not hasattr(datasource, "__aiter__"):
+        datasource = iterate_in_thread(datasource)
+
+    async for source_metadata in datasource:
+        source = apply_path_format(source_metadata, source_filename, source_compression)
+        if isinstance(source_metadata, dict):
+            source = source._replace(size=source_metadata.get("size"))
+        if isinstance(target_filename, list):
+            yield source, [
+                apply_path_format(source_metadata, f, c)
+                for f, c in zip(target_filename, target_compression)
+            ]
+        else:
+            yield source, apply_path_format(
+                source_metadata, target_filename, target_compression
+            )
+
+
+async def _drop_unchanged(source, target, names, policy, concurrency, on_skipped):
+    """
+    Filters out the names whose target is current, looking them up in batches
+    and passing their stats to on_skipped
+    :param source:
+    :param target:
+    :param names:
+    :param policy:
+    :param concurrency:
+    :param on_skipped:
+    :return:
+    """
+    async for batch in _batches(names, 256):
+        changed, unchanged = await _partition_unchanged(
+            source, target, batch, policy, concurrency
+        )
+        for stats in unchanged:
+            on_skipped(stats)
+        for name in changed:
+            yield name
+
+
+async def _batches(items, size):
+    """
+    Groups an async iterable into lists of up to size items
+    :param items:
+    :param size:
+    :return:
+    """
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _one(items):
+    """
+    Yields the items as a single batch
+    :param items:
+    :return:
+    """
+    yield items
+
+
+async def _add_member(writer: ArchiveWriter, source, i, name, block_size) -> FileStats:
+    """
+    Adds a source file to the archive as the member name. Tar members need
+    their size up front, which is the stored size when there is no compression
+    :param writer:
+    :param source:
+    :param i:
+    :param name:
+    :param block_size:
+    :return:
+    """
+    stats = FileStats(source=i.path, target=name, status="archived")
+    started = time.monotonic()
+    size = None
+    if writer.archive_type != "zip" and not i.compression:
+        size = await _size(source, i.path)
+
+    f = await run_sync_in_worker_thread(
+        source.open, i.path, "rb", compression=i.compression
+    )
+    try:
+        stats["bytes"], stored = await run_sync_in_worker_thread(
+            writer.add, name, f, size, block_size
+        )
+    finally:
+        await run_sync_in_worker_thread(f.close)
+
+    if stored is not None:
+        stats["bytes_out"] = stored
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+async def _extract_member(member, target, o, block_size, read_ahead) -> FileStats:
+    """
+    Streams an archive member into the target file
+    :param member:
+    :param target:
+    :param o:
+    :param block_size:
+    :param read_ahead:
+    :return:
+    """
+    stats = FileStats(source=member.name, target=o.path, status="extracted", parts=1)
+    started = time.monotonic()
+    stats.update(
+        await copy_filesystem(
+            anyio.AsyncFile(member),
+            target.open_async(
+                o.path,
+                "wb",
+                compression=o.compression,
+                wrap=Unseekable if requires_staging(o.compression) else None,
+            ),
+            block_size=block_size,
+            read_ahead=read_ahead,
+        )
+    )
+    stats["bytes_in"] = member.compressed_size
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+async def _measure(source, target, stats, concurrency):
+    """
+    Adds the stored source and target sizes, and the figures derived from
+    them, to each file's stats
+    :param source:
+    :param target:
+    :param stats:
+    :param concurrency:
+    :return:
+    """
+    source_infos, target_infos = await map_concurrently(
+        file_infos,
+        [
+            (source, [f["source"] for f in stats], concurrency),
+            (target, [f["target"] for f in stats], concurrency),
+        ],
+        2,
+    )
+    for f, source_info, target_info in zip(stats, source_infos, target_infos):
+        if "bytes_in" not in f:
+            f["bytes_in"] = (source_info or {}).get("size")
+        if "bytes_out" not in f:
+            f["bytes_out"] = (target_info or {}).get("size")
+        if f["bytes_in"] and f["bytes_out"] is not None:
+            f["compression_ratio"] = f["bytes_out"] / f["bytes_in"]
+        if f["bytes_in"] is not None and f.get("seconds"):
+            f["throughput"] = f["bytes_in"] / f["seconds"]
+
+
+async def _create_artifact(key, files, totals):
+    """
+    Publishes the per file stats as a Prefect table artifact
+    :param key:
+    :param files:
+    :param totals:
+    :return:
+    """
+    # Imported here as artifacts are only available from Prefect 2.10
+    from prefect.artifacts import create_table_artifact
+
+    await create_table_artifact(
+        key=key,
+        table=[{k: f.get(k) for k in _ARTIFACT_COLUMNS} for f in files],
+        description=", ".join(f"{k}: {v}" for k, v in totals.items()),
+    )
+
+
+_ARTIFACT_COLUMNS = (
+    "source",
+    "target",
+    "status",
+    "bytes_in",
+    "bytes_out",
+    "compression_ratio",
+    "open_seconds",
+    "read_seconds",
+    "write_seconds",
+    "stage_seconds",
+    "publish_seconds",
+    "seconds",
+    "throughput",
+)
+
+
+async def _partition_unchanged(source, target, resolved_names, policy, concurrency):
+    """
+    Splits the resolved names into those needing a copy and stats for those
+    whose target is already current
+    :param source:
+    :param target:
+    :param resolved_names:
+    :param policy:
+    :param concurrency:
+    :return:
+    """
+    source_infos, target_infos = await map_concurrently(
+        file_infos,
+        [
+            (source, [i.path for i, _ in resolved_names], concurrency),
+            (target, [o.path for _, o in resolved_names], concurrency),
+        ],
+        2,
+    )
+
+    changed, skipped = [], []
+    for (i, o), source_info, target_info in zip(
+        resolved_names, source_infos, target_infos
+    ):
+        passthrough = is_passthrough(i.compression, o.compression, i.path, o.path)
+        if is_unchanged(policy, source_info, target_info, passthrough):
+            skipped.append(FileStats(source=i.path, target=o.path, status="skipped"))
+        else:
+            changed.append((i, o))
+    return changed, skipped
+
+
+async def _run_checkpointed(manifest: CopyManifest, fn):
+    """
+    Runs fn while saving the manifest periodically. The manifest is saved
+    when fn fails, ready for a retry, and removed once it succeeds
+    :param manifest:
+    :param fn:
+    :return:
+    """
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(manifest.autosave)
+            result = await fn()
+            tg.cancel_scope.cancel()
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            await manifest.save()
+        raise
+
+    await manifest.remove()
+    return result
+
+
+async def _transfer(
+    source,
+    i,
+    target,
+    o,
+    block_size,
+    min_block_size,
+    max_block_size,
+    read_ahead,
+    multipart_threshold,
+    multipart_parts,
+    progress: Optional[FileProgress] = None,
+    digests: Optional[List[str]] = None,
+    executor: Optional[Executor] = None,
+    retries: int = 0,
+    retry_backoff: float = 1.0,
+    retry_on: Optional[Tuple[Type[BaseException], ...]] = None,
+) -> FileStats:
+    """
+    Copies a single file. When no re-encoding is needed and both sides share a
+    filesystem, the copy is delegated to the kernel or the filesystem itself.
+    Otherwise large files may be fetched as concurrent byte ranges, and files
+    that are re-encoded are streamed on the executor when one is supplied.
+
+    Streamed bytes are fed into progress, and a progress with a non-zero
+    offset resumes a partial copy by appending to the target.
+
+    When digests are requested the bytes are always streamed, and digests of
+    the stored source, the payload and the stored target are taken in the same
+    pass. Resumed copies only stream part of the file so carry no digests.
+
+    Files of blocks with a rate limit are always streamed in this process, so
+    every byte passes through the limit
+    :param source:
+    :param i:
+    :param target:
+    :param o:
+    :param block_size:
+    :param min_block_size:
+    :param max_block_size:
+    :param read_ahead:
+    :param multipart_threshold:
+    :param multipart_parts:
+    :param progress:
+    :param digests:
+    :param executor:
+    :param retries:
+    :param retry_backoff:
+    :param retry_on:
+    :return:
+    """
+    stats = FileStats(source=i.path, target=o.path, status="copied", parts=1)
+    passthrough = is_passthrough(i.compression, o.compression, i.path, o.path)
+    offset = progress.offset if progress else 0
+    shaped = source.rate_limit() is not None or target.rate_limit() is not None
+    started = time.monotonic()
+    if offset:
+        digests = None
+
+    try:
+        if (
+            passthrough
+            and not offset
+            and not digests
+            and not shaped
+            and await run_sync_in_worker_thread(
+                copy_file_fast, source, i.path, target, o.path
             )
+        ):
+            return stats
 
-        for i, o in resolved_names:
-            logger.info(f"Copying to {o.path}")
-            await copy_filesystem(
-                stage_fs.open_async(o.path, "rb"),
-                target_filesystem.open_async(o.path, "wb"),
-                block_size,
+        if (
+            passthrough
+            and not offset
+            and not digests
+            and not shaped
+            and multipart_threshold is not None
+        ):
+            stats["parts"] = await copy_file_multipart(
+                source,
+                i.path,
+                target,
+                o.path,
+                multipart_threshold,
+                multipart_parts,
+                max_block_size if block_size == "auto" else block_size,
             )
+            if stats["parts"]:
+                return stats
+
+        if passthrough:
+            # Same encoding on both sides, so copy the stored bytes as they are
+            i, o = PathFormat(i.path, None), PathFormat(o.path, None)
+
+        if offset:
+            stats["resumed_from"] = offset
+
+        streamed = (
+            source,
+            i,
+            target,
+            o,
+            offset,
+            block_size,
+            min_block_size,
+            max_block_size,
+            read_ahead,
+            progress,
+            digests,
+            retries,
+            retry_backoff,
+            retry_on,
+        )
+        if executor is not None and not passthrough and not shaped:
+            copied, remote = await asyncio.wrap_future(
+                executor.submit(_stream_file_in_process, *streamed)
+            )
+            if progress:
+                progress.offset, progress.crc32 = remote.offset, remote.crc32
+        else:
+            copied = await _stream_file(*streamed)
+        stats.update(copied)
+
+        if progress and progress.crc32 is not None:
+            stats["crc32"] = progress.crc32
+        return stats
+    finally:
+        stats["seconds"] = time.monotonic() - started
+
+
+@contextmanager
+def _process_pool(max_processes: Optional[int]):
+    """
+    Process pool of max_processes workers, or None when not set. Workers are
+    spawned as forking a process running an event loop and threads is unsafe
+    :param max_processes:
+    :return:
+    """
+    if not max_processes:
+        yield None
+        return
+    with ProcessPoolExecutor(
+        max_processes, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        yield executor
+
+
+async def _stream_file(
+    source,
+    i,
+    target,
+    o,
+    offset,
+    block_size,
+    min_block_size,
+    max_block_size,
+    read_ahead,
+    progress,
+    digests,
+    retries,
+    retry_backoff,
+    retry_on,
+) -> FileStats:
+    """
+    Streams a file through copy_filesystem, decoding and encoding it on the way
+    :param source:
+    :param i:
+    :param target:
+    :param o:
+    :param offset:
+    :param block_size:
+    :param min_block_size:
+    :param max_block_size:
+    :param read_ahead:
+    :param progress:
+    :param digests:
+    :param retries:
+    :param retry_backoff:
+    :param retry_on:
+    :return:
+    """
+    block_size = _block_size(block_size, min_block_size, max_block_size)
+
+    source_digests = Digests(digests) if digests and i.compression else None
+    target_digests = Digests(digests) if digests and o.compression else None
+
+    retried = dict(retries=0)
+    stats = FileStats(
+        **await copy_filesystem(
+            _open_at(
+                source,
+                i,
+                offset,
+                source_digests,
+                _retrying(source, i, retries, retry_backoff, retry_on, retried),
+            ),
+            target.open_async(
+                o.path,
+                "ab" if offset else "wb",
+                compression=o.compression,
+                wrap=_digesting(target_digests),
+            ),
+            block_size=block_size,
+            read_ahead=read_ahead,
+            on_write=progress.update if progress else None,
+            digests=digests,
+        ),
+        parts=1,
+        block_size=block_size.size,
+    )
+    stats["retries"] = retried["retries"]
+
+    if digests:
+        _add_stored_digests(stats, source_digests, target_digests)
+    return stats
+
+
+def _add_stored_digests(
+    stats: FileStats,
+    source_digests: Optional[Digests],
+    target_digests: Optional[Digests],
+):
+    """
+    Adds the digests of the stored source and target to stats. Without
+    compression, and so without digests of their own, the stored bytes are
+    the payload
+    :param stats:
+    :param source_digests:
+    :param target_digests:
+    :return:
+    """
+    stats["source_digests"] = (
+        source_digests.hexdigests() if source_digests else stats["digests"]
+    )
+    stats["target_digests"] = (
+        target_digests.hexdigests() if target_digests else stats["digests"]
+    )
+
+
+def _stream_file_in_process(
+    source,
+    i,
+    target,
+    o,
+    offset,
+    block_size,
+    min_block_size,
+    max_block_size,
+    read_ahead,
+    progress,
+    digests,
+    retries,
+    retry_backoff,
+    retry_on,
+) -> Tuple[FileStats, Optional[FileProgress]]:
+    """
+    Runs _stream_file in a worker process. The progress is returned along with
+    the stats, as the caller's copy of it is not updated
+    :param source:
+    :param i:
+    :param target:
+    :param o:
+    :param offset:
+    :param block_size:
+    :param min_block_size:
+    :param max_block_size:
+    :param read_ahead:
+    :param progress:
+    :param digests:
+    :param retries:
+    :param retry_backoff:
+    :param retry_on:
+    :return:
+    """
+    stats = anyio.run(
+        _stream_file,
+        source,
+        i,
+        target,
+        o,
+        offset,
+        block_size,
+        min_block_size,
+        max_block_size,
+        read_ahead,
+        progress,
+        digests,
+        retries,
+        retry_backoff,
+        retry_on,
+    )
+    return stats, progress
+
+
+def _block_size(block_size, min_block_size, max_block_size) -> BlockSize:
+    """
+    Block size of a single file, adaptive when block_size is "auto"
+    :param block_size:
+    :param min_block_size:
+    :param max_block_size:
+    :return:
+    """
+    if block_size == "auto":
+        return AdaptiveBlockSize(min_block_size, max_block_size)
+    return BlockSize(block_size)
+
+
+def _per_target(value, targets: int) -> list:
+    """
+    A value per target, from a list of them or a value shared by every target
+    :param value:
+    :param targets:
+    :return:
+    """
+    if not isinstance(value, list):
+        return [value] * targets
+    if len(value) != targets:
+        raise Exception(f"Expected a value for each of the {targets} targets")
+    return value
+
+
+async def _each(fn, items):
+    """
+    Awaits fn for each item
+    :param fn:
+    :param items:
+    :return:
+    """
+    for item in items:
+        await fn(item)
+
+
+async def _write_sidecars(block, stats: FileStats):
+    """
+    Writes a sidecar file per target digest, in the format of sha256sum
+    :param block:
+    :param stats:
+    :return:
+    """
+    name = stats["target"].rsplit("/", 1)[-1]
+    for algorithm, digest in (stats.get("target_digests") or {}).items():
+        await run_sync_in_worker_thread(
+            _write_text, block, f"{stats['target']}.{algorithm}", f"{digest}  {name}\n"
+        )
+
+
+def _write_text(block, filename, content):
+    """
+    Writes a small text file
+    :param block:
+    :param filename:
+    :param content:
+    :return:
+    """
+    with block.open(filename, "wt") as fd:
+        fd.write(content)
+
+
+async def _size(block, filename) -> int:
+    """
+    Size of a file stored on the block
+    :param block:
+    :param filename:
+    :return:
+    """
+    fs = block._resolve_abstract_filesystem()
+    return await run_sync_in_worker_thread(fs.size, block.build_path(filename))
+
 
-        logger.info(f"Copied {len(resolved_names)} items")
-        return [(i.path, o.path) for i, o in resolved_names]
+async def _open_at(block, i, offset, digests=None, retrying=None):
+    """
+    Opens the file for reading and seeks to offset, feeding the stored bytes
+    into digests when set. retrying, when set, wraps the stored file first
+    :param block:
+    :param i:
+    :param offset:
+    :param digests:
+    :param retrying:
+    :return:
+    """
+    f = await block.open_async(
+        i.path,
+        "rb",
+        compression=i.compression,
+        wrap=_chain(retrying, _digesting(digests)),
+    )
+    if offset:
+        await f.seek(offset)
+    return f
+
+
+def _retrying(block, i, retries, backoff, retry_on, stats):
+    """
+    Wrapper retrying failed reads of the stored file, which reconnects and
+    reopens it at the stored byte that failed, or None without retries
+    :param block:
+    :param i:
+    :param retries:
+    :param backoff:
+    :param retry_on:
+    :param stats:
+    :return:
+    """
+    if not retries:
+        return None
+    return partial(
+        RetryingFile,
+        reopen=partial(_reopen_stored, block, i.path),
+        retries=retries,
+        backoff=backoff,
+        retry_on=retry_on,
+        stats=stats,
+    )
+
+
+def _reopen_stored(block, filename, position):
+    """
+    Reconnects and reopens a stored file at position
+    :param block:
+    :param filename:
+    :param position:
+    :return:
+    """
+    block.reconnect()
+    f = block.open(filename, "rb")
+    f.seek(position)
+    return f
+
+
+def _chain(*wrappers):
+    """
+    Combines the wrappers that are set into one, applying them in order
+    :param wrappers:
+    :return:
+    """
+    wrappers = [w for w in wrappers if w]
+    if len(wrappers) < 2:
+        return wrappers[0] if wrappers else None
+    return lambda f: reduce(lambda f, w: w(f), wrappers, f)
+
+
+def _fan_out_wrap(o, digests: Optional[Digests]):
+    """
+    Wrapper for a fan-out target, which is written as a stream and fed into
+    digests, if any
+    :param o:
+    :param digests:
+    :return:
+    """
+    digesting = _digesting(digests)
+    if not requires_staging(o.compression):
+        return digesting
+    if digesting is None:
+        return Unseekable
+    return lambda f: Unseekable(digesting(f))
+
+
+def _digesting(digests: Optional[Digests]):
+    """
+    Wrapper feeding the stored bytes of a file into digests, if any
+    :param digests:
+    :return:
+    """
+    return partial(DigestingFile, digests=digests) if digests else None
 
 
 def _expand(t1, t2):
@@ -173,7 +1543,7 @@ def _expand(t1, t2):
 
 def _as_iterable(datasource):
     """
-    Transforms datasource into an iterable list
+    Transforms datasource into an iterable, without materialising it
     :param datasource:
     :return:
     """
@@ -182,5 +1552,5 @@ def _as_iterable(datasource):
         if datasource is None
         else [datasource]
         if isinstance(datasource, dict)
-        else tuple(datasource)
+        else datasource
     )
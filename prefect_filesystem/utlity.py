@@ -2,13 +2,28 @@
 Utility functions
 """
 
+import errno
+import os
+import posixpath
+import shutil
 import sys
-from collections import namedtuple
-from inspect import isawaitable
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+from functools import partial
+from inspect import isawaitable, iscoroutine
+from itertools import islice
+from typing import Dict, List, Optional, Tuple, Type
 
+import anyio
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
 from prefect.blocks.core import Block
+from prefect.utilities.asyncutils import run_sync_in_worker_thread
 
 from prefect_filesystem.abstract_block import AbstractBlock
+from prefect_filesystem.digest import Digests
+from prefect_filesystem.file_wrapper import FileWrapper
 from prefect_filesystem.filesystem_wrapper import AbstractWrapper
 
 if sys.version_info >= (3, 8):
@@ -17,7 +32,7 @@ else:
     from typing_extensions import TypedDict
 
 
-PathFormat = namedtuple("PathFormat", ("path", "compression"))
+PathFormat = namedtuple("PathFormat", ("path", "compression", "size"), defaults=(None,))
 
 
 def apply_path_format(
@@ -34,7 +49,9 @@ def apply_path_format(
     """
     if not isinstance(data, dict):
         return path, compression
-    filename = compression.get(field_name) if isinstance(compression, dict) else ""
+    filename = (
+        compression.get(field_name) or "" if isinstance(compression, dict) else ""
+    )
     return PathFormat(
         path.format(**data),
         {**compression, field_name: filename.format(**data)}
@@ -43,33 +60,862 @@ def apply_path_format(
     )
 
 
-async def copy_filesystem(source, target, block_size=1024 * 1024):
+async def copy_filesystem(
+    source,
+    target,
+    block_size=1024 * 1024,
+    read_ahead=0,
+    on_write=None,
+    digests=None,
+) -> "CopyStats":
     """
-    Copies binary data from source to the target in the specified block_size
+    Copies binary data from source to the target in the specified block_size,
+    which may also be an AdaptiveBlockSize that is tuned as the copy runs.
+
+    When read_ahead is set, reading and writing overlap: up to read_ahead blocks
+    are read ahead of the writer, which keeps memory bounded at roughly
+    (read_ahead + 2) * block_size. on_write is called with each block once it
+    has been written. digests names the algorithms (e.g. ["sha256"]) whose
+    digests of the copied bytes are added to the stats.
+
+    Failed reads may be retried by opening the source with a RetryingFile
+    beneath any compression wrapper
 
     Args:
         source:
         target:
         block_size:
+        read_ahead:
+        on_write:
+        digests:
 
-    Returns:
+    Returns: CopyStats with the bytes copied and the time spent opening,
+        reading and writing
 
     """
-    s = await source if isawaitable(source) else source
-    t = await target if isawaitable(target) else target
+    stats = CopyStats(bytes=0, open_seconds=0.0, read_seconds=0.0, write_seconds=0.0)
+    started = time.monotonic()
+
+    if digests:
+        digests = Digests(digests)
+        on_write = _tee(digests.update, on_write)
 
     try:
-        while True:
-            _bytes = await s.read(block_size)
-            if not _bytes:
-                break
-            await t.write(_bytes)
+        s = await source if isawaitable(source) else source
+    except BaseException:
+        if iscoroutine(target):
+            target.close()
+        raise
+
+    try:
+        t = await target if isawaitable(target) else target
+    except BaseException:
+        if s != source:
+            await s.aclose()
+        raise
+
+    stats["open_seconds"] = time.monotonic() - started
+
+    if not isinstance(block_size, BlockSize):
+        block_size = BlockSize(block_size)
+
+    try:
+        if read_ahead:
+            await _copy_pipelined(s, t, block_size, read_ahead, on_write, stats)
+        else:
+            while True:
+                started = time.monotonic()
+                size = block_size.size
+                _bytes = await s.read(size)
+                read = time.monotonic()
+                stats["read_seconds"] += read - started
+                if not _bytes:
+                    break
+                await t.write(_bytes)
+                written = time.monotonic()
+                stats["write_seconds"] += written - read
+                stats["bytes"] += len(_bytes)
+                if on_write:
+                    on_write(_bytes)
+                block_size.update(size, len(_bytes), written - started)
     finally:
         if s != source:
             await s.aclose()
         if t != target:
             await t.aclose()
 
+    if digests:
+        stats["digests"] = digests.hexdigests()
+    return stats
+
+
+def retryable_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    Exception types retried by default: OSError, which includes connection
+    errors and timeouts, EOFError raised on a closed connection, and
+    paramiko's SSHException when paramiko is installed
+    :return:
+    """
+    errors = (OSError, EOFError)
+    try:
+        from paramiko import SSHException
+    except ImportError:
+        return errors
+    return errors + (SSHException,)
+
+
+class RetryingFile(FileWrapper):
+    """
+    Wraps a stored file being read, reopening it at the current position and
+    trying again when a read fails with one of the retry_on exception types,
+    with exponential backoff between attempts. reopen(position) returns the
+    stored file reopened at position. Beneath a compression wrapper, a retry
+    resumes at the stored byte that failed instead of decoding the file from
+    its start. The count of retries is added to stats["retries"]
+    """
+
+    def __init__(self, f, reopen, retries, backoff=1.0, retry_on=None, stats=None):
+        super().__init__(f)
+        self.reopen = reopen
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_on = tuple(retry_on) if retry_on else retryable_errors()
+        self.stats = stats if stats is not None else dict(retries=0)
+        self._position = f.tell()
+
+    def read(self, size=-1):
+        """
+
+        :param size:
+        :return:
+        """
+        _bytes = self._retry(lambda f: f.read(size))
+        self._position += len(_bytes)
+        return _bytes
+
+    def readinto(self, b):
+        """
+
+        :param b:
+        :return:
+        """
+        _bytes = self.read(len(b))
+        b[: len(_bytes)] = _bytes
+        return len(_bytes)
+
+    def seek(self, offset, whence=0):
+        """
+
+        :param offset:
+        :param whence:
+        :return:
+        """
+        self._position = self._retry(lambda f: f.seek(offset, whence))
+        return self._position
+
+    def tell(self):
+        """
+
+        :return:
+        """
+        return self._position
+
+    def close(self):
+        """
+
+        :return:
+        """
+        if self.f is not None:
+            self.f.close()
+
+    def _retry(self, fn):
+        """
+        Calls fn with the file, reopening it at the current position after a
+        failure
+        :param fn:
+        :return:
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.f is None:
+                    self.f = self.reopen(self._position)
+                return fn(self.f)
+            except self.retry_on:
+                if attempt >= self.retries:
+                    raise
+                self._discard()
+                time.sleep(self.backoff * 2**attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+
+    def _discard(self):
+        """
+        Closes the failed file, ignoring any further error
+        :return:
+        """
+        f, self.f = self.f, None
+        if f is not None:
+            try:
+                f.close()
+            except Exception:
+                pass
+
+
+def _tee(*callbacks):
+    """
+    Combines the callbacks that are set into one
+    :param callbacks:
+    :return:
+    """
+    callbacks = [c for c in callbacks if c]
+
+    def _call(*args):
+        """
+        Calls every callback in turn
+        :param args:
+        :return:
+        """
+        for c in callbacks:
+            c(*args)
+
+    return _call
+
+
+async def _copy_pipelined(s, t, block_size, read_ahead, on_write, stats):
+    """
+    Reads blocks into a bounded queue on one task while another drains it into
+    the target. The reader blocks once read_ahead blocks are waiting, so its
+    timings include the writer's backpressure
+    :param s:
+    :param t:
+    :param block_size:
+    :param read_ahead:
+    :param on_write:
+    :param stats:
+    :return:
+    """
+    send, receive = anyio.create_memory_object_stream(read_ahead)
+
+    async def _reader():
+        """
+        Producer side of the pipeline
+        :return:
+        """
+        async with send:
+            while True:
+                started = time.monotonic()
+                size = block_size.size
+                _bytes = await s.read(size)
+                stats["read_seconds"] += time.monotonic() - started
+                if not _bytes:
+                    break
+                await send.send(_bytes)
+                block_size.update(size, len(_bytes), time.monotonic() - started)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(_reader)
+        async with receive:
+            async for _bytes in receive:
+                started = time.monotonic()
+                await t.write(_bytes)
+                stats["write_seconds"] += time.monotonic() - started
+                stats["bytes"] += len(_bytes)
+                if on_write:
+                    on_write(_bytes)
+
+
+async def copy_filesystem_many(
+    source,
+    targets,
+    block_size=1024 * 1024,
+    read_ahead=0,
+    digests=None,
+) -> List["CopyStats"]:
+    """
+    Copies binary data from source to every target, reading the source once.
+    Each target is written by its own task with up to read_ahead blocks queued
+    for it, and the source is only read once every target has taken the
+    previous block, so the copy runs at the pace of the slowest target. Digests
+    of the copied bytes are added to the stats, as in copy_filesystem
+
+    Args:
+        source:
+        targets:
+        block_size:
+        read_ahead:
+        digests:
+
+    Returns: CopyStats for each target
+
+    """
+    stats = [
+        CopyStats(bytes=0, open_seconds=0.0, read_seconds=0.0, write_seconds=0.0)
+        for _ in targets
+    ]
+    started = time.monotonic()
+
+    if digests:
+        digests = Digests(digests)
+
+    opened = []
+    try:
+        s = await source if isawaitable(source) else source
+        if s != source:
+            opened.append(s)
+        files = []
+        for target in targets:
+            t = await target if isawaitable(target) else target
+            if t != target:
+                opened.append(t)
+            files.append(t)
+    except BaseException:
+        for target in targets:
+            if iscoroutine(target):
+                target.close()
+        for f in opened:
+            await f.aclose()
+        raise
+
+    for f in stats:
+        f["open_seconds"] = time.monotonic() - started
+
+    if not isinstance(block_size, BlockSize):
+        block_size = BlockSize(block_size)
+
+    streams = [anyio.create_memory_object_stream(read_ahead) for _ in targets]
+
+    async def _reader():
+        """
+        Reads the source and hands every block to each writer
+        :return:
+        """
+        try:
+            while True:
+                started = time.monotonic()
+                size = block_size.size
+                _bytes = await s.read(size)
+                for f in stats:
+                    f["read_seconds"] += time.monotonic() - started
+                if not _bytes:
+                    break
+                if digests:
+                    digests.update(_bytes)
+                for send, _ in streams:
+                    await send.send(_bytes)
+                block_size.update(size, len(_bytes), time.monotonic() - started)
+        finally:
+            for send, _ in streams:
+                await send.aclose()
+
+    async def _writer(t, receive, f):
+        """
+        Drains the blocks queued for a target
+        :param t:
+        :param receive:
+        :param f:
+        :return:
+        """
+        async with receive:
+            async for _bytes in receive:
+                started = time.monotonic()
+                await t.write(_bytes)
+                f["write_seconds"] += time.monotonic() - started
+                f["bytes"] += len(_bytes)
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(_reader)
+            for t, (_, receive), f in zip(files, streams, stats):
+                tg.start_soon(_writer, t, receive, f)
+    finally:
+        for f in opened:
+            await f.aclose()
+
+    if digests:
+        for f in stats:
+            f["digests"] = digests.hexdigests()
+    return stats
+
+
+class BlockSize:
+    """
+    Fixed block size used by copy_filesystem
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+    def update(self, requested, received, seconds):
+        """
+        A fixed size ignores timings
+        :param requested:
+        :param received:
+        :param seconds:
+        :return:
+        """
+
+
+class AdaptiveBlockSize(BlockSize):
+    """
+    Block size tuned by hill climbing on measured throughput. It starts at
+    minimum and keeps doubling (or halving) while throughput improves, turning
+    around when a block is more than tolerance slower than the one before
+    """
+
+    def __init__(self, minimum=64 * 1024, maximum=16 * 1024 * 1024, tolerance=0.1):
+        super().__init__(minimum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self._grow = True
+        self._throughput = None
+
+    def update(self, requested, received, seconds):
+        """
+        Records the timing of a block and picks the size of the next one. Short
+        blocks at the end of the file are ignored
+        :param requested:
+        :param received:
+        :param seconds:
+        :return:
+        """
+        if received < requested:
+            return
+
+        throughput = received / max(seconds, 1e-9)
+        if self._throughput and throughput < self._throughput * (1 - self.tolerance):
+            self._grow = not self._grow
+        self._throughput = throughput
+
+        size = self.size * 2 if self._grow else self.size // 2
+        self.size = max(self.minimum, min(self.maximum, size))
+
+
+def copy_file_fast(source, source_path, target, target_path) -> bool:
+    """
+    Copies a file without passing its bytes through Python, when both blocks
+    share a filesystem. Local files are copied by the kernel and remote files by
+    the filesystem's own copy. Returns False when no fast path is available
+
+    Args:
+        source:
+        source_path:
+        target:
+        target_path:
+
+    Returns:
+
+    """
+    source_fs = source._resolve_abstract_filesystem()
+    target_fs = target._resolve_abstract_filesystem()
+    source_path = source.build_path(source_path)
+    target_path = target.build_path(target_path)
+
+    if isinstance(source_fs, LocalFileSystem) and isinstance(
+        target_fs, LocalFileSystem
+    ):
+        target_path = target_fs._strip_protocol(target_path)
+        if target_fs.auto_mkdir:
+            target_fs.makedirs(target_fs._parent(target_path), exist_ok=True)
+        _copy_local_file(source_fs._strip_protocol(source_path), target_path)
+        return True
+
+    # SFTP and FTP filesystems, among others, leave cp_file unimplemented
+    if (
+        source_fs is target_fs
+        and type(source_fs).cp_file is not AbstractFileSystem.cp_file
+    ):
+        source_fs.cp_file(source_path, target_path)
+        return True
+
+    return False
+
+
+def _copy_local_file(source_path, target_path):
+    """
+    Uses copy_file_range where available, which also reflinks on copy-on-write
+    filesystems, and otherwise shutil.copyfile (sendfile / fcopyfile)
+    :param source_path:
+    :param target_path:
+    :return:
+    """
+    if os.path.exists(target_path) and os.path.samefile(source_path, target_path):
+        raise shutil.SameFileError(f"{source_path} and {target_path} are the same")
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(source_path, "rb") as s, open(target_path, "wb") as t:
+                while os.copy_file_range(s.fileno(), t.fileno(), 1 << 30):
+                    pass
+            return
+        except OSError as ex:
+            if ex.errno not in _COPY_RANGE_UNSUPPORTED:
+                raise
+
+    shutil.copyfile(source_path, target_path)
+
+
+_COPY_RANGE_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+
+
+async def copy_file_multipart(
+    source, source_path, target, target_path, threshold, max_parts, block_size
+) -> int:
+    """
+    Copies a file of at least threshold bytes as up to max_parts byte ranges,
+    each read through its own handle and written at its offset in the target.
+    Only local targets can be written out of order. Returns the number of parts
+    used, or 0 when the file was not copied
+
+    Args:
+        source:
+        source_path:
+        target:
+        target_path:
+        threshold:
+        max_parts:
+        block_size:
+
+    Returns:
+
+    """
+    source_fs = source._resolve_abstract_filesystem()
+    target_fs = target._resolve_abstract_filesystem()
+    if not isinstance(target_fs, LocalFileSystem) or not hasattr(os, "pwrite"):
+        return 0
+
+    source_path = source.build_path(source_path)
+    size = await run_sync_in_worker_thread(source_fs.size, source_path)
+    if size is None or size < threshold:
+        return 0
+
+    parts = max(1, min(max_parts, -(-size // block_size)))
+    bounds = [size * n // parts for n in range(parts + 1)]
+
+    target_path = target_fs._strip_protocol(target.build_path(target_path))
+    if target_fs.auto_mkdir:
+        target_fs.makedirs(target_fs._parent(target_path), exist_ok=True)
+
+    fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        os.ftruncate(fd, size)
+        await map_concurrently(
+            partial(
+                run_sync_in_worker_thread,
+                _copy_range,
+                source_fs,
+                source_path,
+                fd,
+                block_size,
+            ),
+            zip(bounds, bounds[1:]),
+            parts,
+        )
+    finally:
+        os.close(fd)
+
+    return parts
+
+
+def _copy_range(fs, path, fd, block_size, start, end):
+    """
+    Copies bytes [start, end) of path into the same offsets of fd
+    :param fs:
+    :param path:
+    :param fd:
+    :param block_size:
+    :param start:
+    :param end:
+    :return:
+    """
+    with fs.open(path, "rb") as f:
+        f.seek(start)
+        while start < end:
+            _bytes = f.read(min(block_size, end - start))
+            if not _bytes:
+                raise EOFError(f"{path} ended at {start}, expected {end} bytes")
+            while _bytes:
+                written = os.pwrite(fd, _bytes, start)
+                start += written
+                _bytes = _bytes[written:]
+
+
+async def map_concurrently(fn, items, max_concurrency=1, on_result=None) -> list:
+    """
+    Awaits fn(*item) for every item using at most max_concurrency tasks at once.
+    Items may be any iterable or async iterable, and are only pulled as a task
+    becomes free. Results are returned in the same order as the supplied items,
+    unless on_result is supplied, in which case each result is passed to it as
+    it completes and nothing is retained
+
+    Args:
+        fn:
+        items:
+        max_concurrency:
+        on_result:
+
+    Returns:
+
+    """
+    if isinstance(items, (list, tuple)):
+        max_concurrency = min(max_concurrency or 1, len(items))
+
+    results = []
+    pending = _aiter(items)
+    lock = anyio.Lock()
+
+    async def _worker():
+        """
+        Pulls the next item from the shared iterator until it is exhausted
+        :return:
+        """
+        while True:
+            async with lock:
+                try:
+                    item = await pending.__anext__()
+                except StopAsyncIteration:
+                    return
+                index = len(results)
+                if on_result is None:
+                    results.append(None)
+            if on_result is None:
+                results[index] = await fn(*item)
+            else:
+                await on_result(await fn(*item))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(max(1, max_concurrency or 1)):
+            tg.start_soon(_worker)
+
+    return results
+
+
+async def _aiter(items):
+    """
+    Async iterator over a sync or async iterable
+    :param items:
+    :return:
+    """
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def iterate_in_thread(iterable, chunk_size=256):
+    """
+    Async iterator over a blocking iterable, such as a directory walk, pulling
+    up to chunk_size items at a time in a worker thread
+
+    Args:
+        iterable:
+        chunk_size:
+
+    Returns:
+
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = await run_sync_in_worker_thread(list, islice(iterator, chunk_size))
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
+
+
+async def file_infos(block, paths, max_concurrency=1) -> List[Optional[dict]]:
+    """
+    Looks up fs.info for every path, None where the file does not exist. Paths
+    sharing a directory are fetched with a single detailed listing rather than
+    one round trip per file
+
+    Args:
+        block:
+        paths:
+        max_concurrency:
+
+    Returns:
+
+    """
+    fs = block._resolve_abstract_filesystem()
+    names = [fs._strip_protocol(block.build_path(p)).rstrip("/") for p in paths]
+    folders = defaultdict(list)
+    for name in names:
+        folders[posixpath.dirname(name)].append(name)
+
+    found = {}
+    await map_concurrently(
+        partial(run_sync_in_worker_thread, _folder_infos, fs, found),
+        folders.items(),
+        max_concurrency,
+    )
+    return [found.get(name) for name in names]
+
+
+def _folder_infos(fs, found, folder, names):
+    """
+    Adds the info of the named files within folder into found
+    :param fs:
+    :param found:
+    :param folder:
+    :param names:
+    :return:
+    """
+    try:
+        if len(names) == 1:
+            found[names[0]] = fs.info(names[0])
+            return
+        wanted = set(names)
+        for info in fs.ls(folder, detail=True):
+            name = fs._strip_protocol(info["name"]).rstrip("/")
+            if name in wanted:
+                found[name] = info
+    except FileNotFoundError:
+        pass
+
+
+def is_unchanged(policy, source_info, target_info, passthrough) -> bool:
+    """
+    Decides whether the target is already current with the source.
+
+    "size_mtime" needs the target to be no older than the source and
+    "size_checksum" needs matching checksums reported by the filesystems. Sizes
+    must match too, but only when the bytes are copied without re-encoding
+
+    Args:
+        policy:
+        source_info:
+        target_info:
+        passthrough:
+
+    Returns:
+
+    """
+    if not source_info or not target_info:
+        return False
+    if passthrough and source_info.get("size") != target_info.get("size"):
+        return False
+
+    if policy == "size_mtime":
+        source_mtime = _info_mtime(source_info)
+        target_mtime = _info_mtime(target_info)
+        return None not in (source_mtime, target_mtime) and target_mtime >= source_mtime
+    if policy == "size_checksum":
+        checksum = _info_checksum(source_info)
+        return (
+            passthrough
+            and checksum is not None
+            and checksum == _info_checksum(target_info)
+        )
+
+    raise Exception(f"Unknown skip_unchanged policy {policy}")
+
+
+def _info_mtime(info) -> Optional[float]:
+    """
+    Modification time of a file as a timestamp, naive datetimes are UTC
+    :param info:
+    :return:
+    """
+    for key in _MTIME_KEYS:
+        value = info.get(key)
+        if isinstance(value, datetime):
+            return (
+                value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+            ).timestamp()
+        if isinstance(value, (int, float)):
+            return value
+    return None
+
+
+def _info_checksum(info) -> Optional[str]:
+    """
+    Content checksum published by the filesystem, if any
+    :param info:
+    :return:
+    """
+    for key in _CHECKSUM_KEYS:
+        if info.get(key):
+            return f"{key}:{info[key]}"
+    return None
+
+
+_MTIME_KEYS = ("mtime", "LastModified", "last_modified", "updated", "modified")
+_CHECKSUM_KEYS = ("md5", "sha256", "crc32c", "ETag", "etag", "checksum")
+
+
+class CopyStats(TypedDict, total=False):
+    """
+    Bytes streamed by copy_filesystem and the time spent in each phase
+    """
+
+    bytes: int
+    open_seconds: float
+    read_seconds: float
+    write_seconds: float
+    digests: Dict[str, str]
+
+
+class FileStats(CopyStats, total=False):
+    """
+    Per file details reported by filesystem_copy. bytes_in and bytes_out are
+    the stored sizes of the source and target, and bytes the (decompressed)
+    payload streamed between them. Likewise source_digests and target_digests
+    are digests of the stored bytes and digests those of the payload. Staged
+    copies split seconds into stage_seconds and publish_seconds, and fan-out
+    copies give the position of the target in target_index. retries counts
+    the failed source reads that were retried
+    """
+
+    source: str
+    target: str
+    target_index: int
+    source_digests: Dict[str, str]
+    target_digests: Dict[str, str]
+    status: str
+    parts: int
+    retries: int
+    block_size: int
+    resumed_from: int
+    crc32: int
+    bytes_in: int
+    bytes_out: int
+    compression_ratio: float
+    seconds: float
+    stage_seconds: float
+    publish_seconds: float
+    throughput: float
+
+
+class CopyTotals(TypedDict, total=False):
+    """
+    Aggregate figures for a whole filesystem_copy
+    """
+
+    files: int
+    skipped: int
+    bytes_in: int
+    bytes_out: int
+    bytes: int
+    retries: int
+    ideal_makespan: float
+    compression_ratio: float
+    seconds: float
+    throughput: float
+
+
+class CopySummary(TypedDict, total=False):
+    """
+    Result of filesystem_copy when a summary is requested
+    """
+
+    files: list
+    skipped: list
+    totals: CopyTotals
+
 
 class CompressionType(TypedDict, total=False):
     """
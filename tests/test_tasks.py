@@ -1,11 +1,39 @@
+import bz2
+import gzip
+import hashlib
+import io
 import json
+import os
+import tarfile
+import threading
+import time
 import uuid
+import zipfile
+import zlib
 from os import path
 from tempfile import TemporaryDirectory
 
+import pytest
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.implementations.memory import MemoryFile, MemoryFileSystem
+from prefect.filesystems import RemoteFileSystem
+
+from prefect_filesystem.abstract_block import AbstractBlock
 from prefect_filesystem.abstract_local_filesystem import AbstractLocalFileSystem
+from prefect_filesystem.archive import Unseekable
 from prefect_filesystem.compression import named_unzip
+from prefect_filesystem.planner import TransferPlan
+from prefect_filesystem.rate_limit import RateLimit, set_rate_limit
+from prefect_filesystem.staging import StagingArea
 from prefect_filesystem.tasks import filesystem_copy, filesystem_get, filesystem_put
+from prefect_filesystem.utlity import (
+    AdaptiveBlockSize,
+    RetryingFile,
+    copy_file_fast,
+    copy_filesystem,
+    ensure_abstract,
+)
 
 
 class TempIt:
@@ -41,6 +69,127 @@ class TempIt:
         return b"test_block"
 
 
+class IndependentMemoryFileSystem(MemoryFileSystem):
+    """Memory filesystem opening an independent handle per read, like remotes"""
+
+    def _open(self, path, mode="rb", **kwargs):
+        f = super()._open(path, mode, **kwargs)
+        if mode == "rb":
+            return MemoryFile(self, self._strip_protocol(path), f.getvalue())
+        return f
+
+
+class MemoryBlock(AbstractBlock):
+    """Remote-like filesystem block backed by fsspec's in-memory filesystem"""
+
+    def __init__(self):
+        self.basepath = f"memory://{uuid.uuid1()}"
+        self.filesystem = IndependentMemoryFileSystem()
+
+    def write(self, name, content):
+        with self.open(name, "wb") as fp:
+            fp.write(content)
+
+    def read(self, name):
+        with self.open(name, "rb") as fp:
+            return fp.read()
+
+
+class FlakyFile:
+    """Local file raising a connection error once more than after bytes are read"""
+
+    def __init__(self, f, after):
+        self.f = f
+        self.after = after
+
+    def read(self, size=-1):
+        if self.f.tell() >= self.after:
+            raise ConnectionResetError("injected fault")
+        return self.f.read(min(size, self.after - self.f.tell()))
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+class FlakyFileSystem(LocalFileSystem):
+    """Local filesystem whose first reads fail part way through the file"""
+
+    cachable = False
+
+    def __init__(self, failures, after):
+        super().__init__()
+        self.failures = failures
+        self.after = after
+
+    def _open(self, path, mode="rb", **kwargs):
+        f = super()._open(path, mode, **kwargs)
+        if "r" in mode and self.failures:
+            self.failures -= 1
+            return FlakyFile(f, self.after)
+        return f
+
+
+class FlakyBlock(AbstractBlock):
+    """Local block injecting read faults"""
+
+    def __init__(self, root, failures, after):
+        self.basepath = f"file://{root}"
+        self.filesystem = FlakyFileSystem(failures, after)
+
+
+class ConnectionDropped(Exception):
+    """Connection failure that is not an OSError, like paramiko's SSHException"""
+
+
+class DroppingFile:
+    """Local file whose connection drops once more than after bytes are read"""
+
+    def __init__(self, fs, f):
+        self.fs = fs
+        self.f = f
+
+    def read(self, size=-1):
+        state = self.fs.state
+        if not state["dropped"] and self.f.tell() >= state["after"]:
+            state["dropped"] = self.fs.dead = True
+            raise ConnectionDropped("connection closed")
+        if not state["dropped"]:
+            size = min(size, state["after"] - self.f.tell())
+        data = self.f.read(size)
+        state["read"] += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+class DroppingFileSystem(LocalFileSystem):
+    """Cached local filesystem that stays dead once its connection drops"""
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        self.dead = False
+
+    def _open(self, path, mode="rb", **kwargs):
+        if self.dead:
+            raise ConnectionDropped("connection closed")
+        f = super()._open(path, mode, **kwargs)
+        return DroppingFile(self, f) if "r" in mode else f
+
+
+class DroppingBlock(AbstractBlock):
+    """Local block resolving its filesystem through the fsspec instance cache"""
+
+    def __init__(self, root, state):
+        self.basepath = f"file://{root}"
+        self.state = state
+
+    @property
+    def filesystem(self):
+        return DroppingFileSystem(self.state)
+
+
 def test_unzip_named_filename():
 
     with TempIt() as tmp:
@@ -272,3 +421,1251 @@ async def test_local_copy_compression_zip_ex(prefect_disable_logging):
             filename=file2, filesystem=lfs2, transform="json"
         )
         assert content == new_data
+
+
+class InFlightFile:
+    """Memory file recording how many reads are in flight at once"""
+
+    def __init__(self, fs, f):
+        self.fs = fs
+        self.f = f
+
+    def read(self, size=-1):
+        with self.fs.lock:
+            self.fs.reading += 1
+            self.fs.peak = max(self.fs.peak, self.fs.reading)
+        try:
+            time.sleep(0.02)
+            return self.f.read(size)
+        finally:
+            with self.fs.lock:
+                self.fs.reading -= 1
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+class InFlightMemoryFileSystem(IndependentMemoryFileSystem):
+    """Memory filesystem recording the peak number of concurrent reads"""
+
+    cachable = False
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.reading = 0
+        self.peak = 0
+
+    def _open(self, path, mode="rb", **kwargs):
+        f = super()._open(path, mode, **kwargs)
+        return InFlightFile(self, f) if mode == "rb" else f
+
+
+async def test_local_copy_concurrent(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        mfs = MemoryBlock()
+        mfs.filesystem = InFlightMemoryFileSystem()
+        names = [tmp.get_filename() for _ in range(10)]
+        for name in names:
+            mfs.write(name, name.encode())
+
+        result = await filesystem_copy.fn(
+            source_filename="{name}",
+            source_filesystem=mfs,
+            target_filename="copy_{name}",
+            target_filesystem=lfs,
+            datasource=[{"name": name} for name in names],
+            max_concurrency=4,
+        )
+
+        assert result == [(name, f"copy_{name}") for name in names]
+        for name in names:
+            assert tmp.read_file(f"copy_{name}") == name
+        assert 1 < mfs.filesystem.peak <= 4
+
+
+async def test_local_copy_unstaged(prefect_disable_logging):
+    """Stream straight into the target, recompressing on the way"""
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        file2 = tmp.get_filename()
+        content = [{"a": "my_content", "b": 2, "c": i} for i in range(1000)]
+        await filesystem_put.fn(
+            content=content, filename=file, filesystem=lfs, compression="zip"
+        )
+
+        await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=lfs,
+            source_compression="zip",
+            target_filename=file2,
+            target_filesystem=lfs,
+            target_compression="gzip",
+            stage=False,
+        )
+
+        new_data = await filesystem_get.fn(
+            filename=file2, filesystem=lfs, transform="json", compression="gzip"
+        )
+        assert content == new_data
+
+
+async def test_local_copy_unstaged_zip_ex(prefect_disable_logging):
+    """Zip targets fall back to the staging area"""
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        file2 = tmp.get_filename()
+        content = {"a": "my_content", "b": 2, "c": 3}
+        await filesystem_put.fn(content=content, filename=file, filesystem=lfs)
+
+        await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=lfs,
+            target_filename=file2,
+            target_filesystem=lfs,
+            target_compression={"type": "zip_ex", "filename": "data.json"},
+            stage=False,
+        )
+
+        with open(path.join(tmp.dir.name, file2), "rb") as fp:
+            with named_unzip(fp, "r", "data.json") as xx:
+                assert json.load(xx) == content
+
+
+async def test_copy_filesystem_read_ahead(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        file2 = tmp.get_filename()
+        content = bytes(range(256)) * 4099
+        await filesystem_put.fn(content=content, filename=file, filesystem=lfs)
+
+        await copy_filesystem(
+            lfs.open_async(file, "rb"),
+            lfs.open_async(file2, "wb"),
+            block_size=1000,
+            read_ahead=3,
+        )
+
+        assert tmp.read_file(file2, "rb") == content
+
+
+def test_copy_file_fast_local():
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        target = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        file = tmp.get_filename()
+        content = tmp.data_block() * 1024
+        with open(path.join(tmp.dir.name, file), "wb") as fp:
+            fp.write(content)
+
+        assert copy_file_fast(lfs, file, target, f"sub/{file}")
+        assert tmp.read_file(f"sub/{file}", "rb") == content
+
+
+class NoCopyMemoryFileSystem(IndependentMemoryFileSystem):
+    """Memory filesystem without a server side copy, like SFTP"""
+
+    cp_file = AbstractFileSystem.cp_file
+
+
+async def test_memory_copy_without_server_side_copy(prefect_disable_logging):
+    mfs = MemoryBlock()
+    mfs.filesystem = NoCopyMemoryFileSystem()
+    mfs.write("in", b"no cp_file")
+    assert not copy_file_fast(mfs, "in", mfs, "out")
+
+    await filesystem_copy.fn(
+        source_filename="in",
+        source_filesystem=mfs,
+        target_filename="out",
+        target_filesystem=mfs,
+        stage=False,
+    )
+    assert mfs.read("out") == b"no cp_file"
+
+
+async def test_local_copy_unstaged_passthrough(prefect_disable_logging):
+    """Identical compression is copied without re-encoding"""
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        file2 = tmp.get_filename()
+        content = [{"a": "my_content", "b": 2, "c": i} for i in range(1000)]
+        await filesystem_put.fn(
+            content=content, filename=file, filesystem=lfs, compression="gzip"
+        )
+
+        await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=lfs,
+            source_compression="gzip",
+            target_filename=file2,
+            target_filesystem=lfs,
+            target_compression="gzip",
+            stage=False,
+        )
+
+        assert tmp.read_file(file, "rb") == tmp.read_file(file2, "rb")
+
+
+async def test_memory_copy_multipart(prefect_disable_logging):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        content = bytes(range(256)) * 4099
+        mfs.write(file, content)
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=mfs,
+            target_filesystem=lfs,
+            block_size=64 * 1024,
+            multipart_threshold=1024,
+            multipart_parts=4,
+            stage=False,
+            return_summary=True,
+        )
+
+        assert summary["files"][0]["parts"] == 4
+        assert tmp.read_file(file, "rb") == content
+
+
+async def test_memory_copy_manifest_skips_completed(prefect_disable_logging):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        names = [tmp.get_filename() for _ in range(3)]
+        mfs.write(names[0], b"first")
+        copy = dict(
+            source_filename="{name}",
+            source_filesystem=mfs,
+            target_filesystem=lfs,
+            datasource=[{"name": name} for name in names],
+            stage=False,
+            manifest="copy.manifest",
+            return_summary=True,
+        )
+
+        with pytest.raises(Exception):
+            await filesystem_copy.fn(**copy)
+        assert [e["source"] for e in tmp.read_json("copy.manifest")["completed"]] == [
+            names[0]
+        ]
+
+        for name in names[1:]:
+            mfs.write(name, b"next")
+        summary = await filesystem_copy.fn(**copy)
+
+        assert [f["status"] for f in summary["files"]] == [
+            "resumed",
+            "copied",
+            "copied",
+        ]
+        assert not path.exists(path.join(tmp.dir.name, "copy.manifest"))
+
+
+async def test_memory_copy_manifest_resumes_partial(prefect_disable_logging):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        content = bytes(range(256)) * 4099
+        mfs.write(file, content)
+        with open(path.join(tmp.dir.name, file), "wb") as fp:
+            fp.write(content[:1000])
+        with open(path.join(tmp.dir.name, "copy.manifest"), "wt") as fp:
+            partial = dict(source=file, target=file, offset=600)
+            json.dump(
+                {"partial": [{**partial, "crc32": zlib.crc32(content[:600])}]}, fp
+            )
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=mfs,
+            target_filesystem=lfs,
+            stage=False,
+            manifest="copy.manifest",
+            return_summary=True,
+        )
+
+        assert summary["files"][0]["resumed_from"] == 1000
+        assert summary["files"][0]["crc32"] == zlib.crc32(content)
+        assert tmp.read_file(file, "rb") == content
+
+
+async def test_local_copy_skip_unchanged(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        names = [tmp.get_filename() for _ in range(3)]
+        for name in names:
+            await filesystem_put.fn(content=name, filename=name, filesystem=lfs)
+            await filesystem_put.fn(
+                content=name, filename=f"copy_{name}", filesystem=lfs
+            )
+            os.utime(path.join(tmp.dir.name, name), (1000, 1000))
+        await filesystem_put.fn(content="changed", filename=names[1], filesystem=lfs)
+
+        summary = await filesystem_copy.fn(
+            source_filename="{name}",
+            source_filesystem=lfs,
+            target_filename="copy_{name}",
+            target_filesystem=lfs,
+            datasource=[{"name": name} for name in names],
+            skip_unchanged="size_mtime",
+            return_summary=True,
+        )
+
+        assert [f["source"] for f in summary["files"]] == [names[1]]
+        assert [f["source"] for f in summary["skipped"]] == [names[0], names[2]]
+        assert tmp.read_file(f"copy_{names[1]}") == "changed"
+
+
+def test_adaptive_block_size():
+    block_size = AdaptiveBlockSize(minimum=1024, maximum=8192)
+    for seconds in (1.0, 1.0, 1.0, 1.0):
+        block_size.update(block_size.size, block_size.size, seconds)
+    assert block_size.size == 8192
+
+    block_size.update(block_size.size, block_size.size, 100.0)
+    assert block_size.size == 4096
+
+    block_size.update(10, 5, 100.0)
+    assert block_size.size == 4096
+
+
+async def test_memory_copy_adaptive_block_size(prefect_disable_logging):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        content = bytes(range(256)) * 4099
+        mfs.write(file, content)
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=mfs,
+            target_filesystem=lfs,
+            target_compression="gzip",
+            block_size="auto",
+            min_block_size=1024,
+            max_block_size=64 * 1024,
+            stage=False,
+            read_ahead=2,
+            return_summary=True,
+        )
+
+        assert 1024 <= summary["files"][0]["block_size"] <= 64 * 1024
+        assert content == await filesystem_get.fn(
+            filename=file, filesystem=lfs, compression="gzip", encoding=None
+        )
+
+
+async def test_local_copy_summary(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        file2 = tmp.get_filename()
+        content = "my_content" * 2048
+        await filesystem_put.fn(content=content, filename=file, filesystem=lfs)
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=lfs,
+            target_filename=file2,
+            target_filesystem=lfs,
+            target_compression="gzip",
+            return_summary=True,
+            artifact_key="copy-stats",
+        )
+
+        stats = summary["files"][0]
+        assert stats["bytes"] == len(content)
+        assert stats["bytes_in"] == len(content)
+        assert stats["bytes_out"] < stats["bytes_in"]
+        assert stats["seconds"] == stats["stage_seconds"] + stats["publish_seconds"]
+        assert summary["totals"]["files"] == 1
+        assert summary["totals"]["bytes_out"] == stats["bytes_out"]
+
+
+async def test_memory_copy_glob(prefect_disable_logging):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        for name in (
+            "inbound/2026-01/a.csv",
+            "inbound/2026-01/sub/b.csv",
+            "inbound/2026-02/c.txt",
+            "inbound/2025-12/d.csv",
+            "outbound/2026-01/e.csv",
+        ):
+            mfs.write(name, name.encode())
+
+        result = await filesystem_copy.fn(
+            source_filename="{path}",
+            source_filesystem=mfs,
+            target_filename="copy/{name}",
+            target_filesystem=lfs,
+            source_glob="inbound/2026-*/**/*.csv",
+            stage=False,
+        )
+
+        assert result == [
+            ("inbound/2026-01/a.csv", "copy/a.csv"),
+            ("inbound/2026-01/sub/b.csv", "copy/b.csv"),
+        ]
+        assert tmp.read_file("copy/b.csv") == "inbound/2026-01/sub/b.csv"
+        assert [f["path"] for f in mfs.iter_files("inbound/2026-01")] == [
+            "inbound/2026-01/a.csv",
+            "inbound/2026-01/sub/b.csv",
+        ]
+
+
+@pytest.mark.parametrize("block", ["local", "memory"])
+async def test_copy_glob_naming_a_file(prefect_disable_logging, block):
+    with TempIt() as tmp:
+        if block == "local":
+            source = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        else:
+            source = MemoryBlock()
+        for n in range(3):
+            with source.open(f"in/{n}.txt", "wb") as fd:
+                fd.write(f"content {n}".encode())
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+
+        assert list(source.iter_files("in/1.txt")) == [
+            dict(path="in/1.txt", name="1.txt", size=9)
+        ]
+        assert list(source.iter_files("in/missing.txt")) == []
+
+        result = await filesystem_copy.fn(
+            source_filename="{path}",
+            source_filesystem=source,
+            target_filename="copy/{name}",
+            target_filesystem=lfs,
+            source_glob="in/1.txt",
+            stage=False,
+        )
+
+        assert result == [("in/1.txt", "copy/1.txt")]
+        assert tmp.read_file("copy/1.txt") == "content 1"
+
+
+async def test_local_copy_async_datasource_totals(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        for i in range(5):
+            await filesystem_put.fn(
+                content=f"content {i}", filename=f"in/{i}.txt", filesystem=lfs
+            )
+
+        async def rows():
+            for i in range(5):
+                yield dict(id=i)
+
+        summary = await filesystem_copy.fn(
+            source_filename="in/{id}.txt",
+            source_filesystem=lfs,
+            target_filename="out/{id}.txt",
+            target_filesystem=lfs,
+            datasource=rows(),
+            max_concurrency=2,
+            window=2,
+            return_summary="totals",
+        )
+
+        assert summary["files"] is None
+        assert summary["totals"]["files"] == 5
+        assert summary["totals"]["bytes_in"] == 5 * len("content 0")
+        assert tmp.read_file("out/4.txt") == "content 4"
+
+
+async def test_staging_area_memory_budget():
+    with TempIt() as tmp:
+        with StagingArea.make_temp(
+            tmp.dir.name, memory_threshold=10, memory_budget=15
+        ) as staging:
+            assert staging.reserve("a") is staging.memory
+            assert staging.reserve("b", 8) is staging.memory
+            assert staging.reserve("c", 20) is staging.disk
+            with staging.memory.open("a", "wb") as fp:
+                fp.write(b"abcdefgh")
+            assert staging.memory_used == 8
+            assert staging.tier("a") is staging.memory
+
+            # b fits its threshold but not the remaining budget, so spills
+            with staging.memory.open("b", "wb") as fp:
+                fp.write(b"1234")
+                fp.write(b"5678")
+                assert fp.tell() == 8
+            assert staging.memory_used == 8
+            assert staging.tier("b") is staging.disk
+            with staging.disk.open("b", "rb") as fp:
+                assert fp.read() == b"12345678"
+
+            assert staging.reserve("d") is staging.memory
+            await staging.release("a")
+            assert staging.memory_used == 0
+            assert staging.tier("a") is staging.disk
+
+
+class PeakMemory:
+    """Records the files charged to and spilled from the staging memory tier"""
+
+    def __init__(self, monkeypatch):
+        self.peak = 0
+        self.charged = set()
+        self.spilled = set()
+        charge, spill = StagingArea.charge, StagingArea.spill
+
+        def _charge(staging, filename, size):
+            charged = charge(staging, filename, size)
+            if charged:
+                self.charged.add(filename)
+            self.peak = max(self.peak, staging.memory_used)
+            return charged
+
+        def _spill(staging, filename):
+            self.spilled.add(filename)
+            spill(staging, filename)
+
+        monkeypatch.setattr(StagingArea, "charge", _charge)
+        monkeypatch.setattr(StagingArea, "spill", _spill)
+
+
+async def test_local_copy_memory_staging(prefect_disable_logging, monkeypatch):
+    memory = PeakMemory(monkeypatch)
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        large = os.urandom(1000)
+        await filesystem_put.fn(content="small", filename="in/a.txt", filesystem=lfs)
+        await filesystem_put.fn(content=large, filename="in/b.txt", filesystem=lfs)
+
+        result = await filesystem_copy.fn(
+            source_filename="in/{name}",
+            source_filesystem=lfs,
+            target_filename="out/{name}.gz",
+            target_filesystem=lfs,
+            target_compression="gzip",
+            datasource=[dict(name="a.txt"), dict(name="b.txt")],
+            stage_memory_threshold=100,
+            stage_dir=tmp.dir.name,
+        )
+
+        assert result == [("in/a.txt", "out/a.txt.gz"), ("in/b.txt", "out/b.txt.gz")]
+        assert gzip.decompress(tmp.read_file("out/a.txt.gz", "rb")) == b"small"
+        assert gzip.decompress(tmp.read_file("out/b.txt.gz", "rb")) == large
+        assert memory.charged == {"out/a.txt.gz", "out/b.txt.gz"}
+        assert memory.spilled == {"out/b.txt.gz"}
+
+
+async def test_local_copy_memory_staging_budget(prefect_disable_logging, monkeypatch):
+    memory = PeakMemory(monkeypatch)
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = [os.urandom(8 * 1024) for _ in range(10)]
+        for n, data in enumerate(content):
+            with lfs.open(f"in/{n}.gz", "wb", compression="gzip") as fd:
+                fd.write(data)
+
+        await filesystem_copy.fn(
+            source_filename="in/{name}.gz",
+            source_filesystem=lfs,
+            source_compression="gzip",
+            target_filename="out/{name}",
+            target_filesystem=lfs,
+            datasource=[dict(name=n) for n in range(10)],
+            max_concurrency=4,
+            block_size=1024,
+            stage_memory_threshold=16 * 1024,
+            stage_memory_budget=16 * 1024,
+            stage_dir=tmp.dir.name,
+        )
+
+        for n, data in enumerate(content):
+            assert tmp.read_file(f"out/{n}", "rb") == data
+        assert memory.charged
+        assert memory.spilled
+        assert memory.peak <= 16 * 1024
+
+
+@pytest.mark.parametrize("stage", [True, False])
+async def test_local_copy_digests(prefect_disable_logging, stage):
+    with TempIt() as tmp:
+        lfs = tmp.get_local_filesystem()
+        file = tmp.get_filename()
+        content = b"my_content" * 2048
+        await filesystem_put.fn(content=content, filename=file, filesystem=lfs)
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=lfs,
+            target_filename=f"{file}.gz",
+            target_filesystem=lfs,
+            target_compression="gzip",
+            stage=stage,
+            digests=["sha256", "crc32"],
+            digest_sidecars=True,
+            return_summary=True,
+        )
+
+        stats = summary["files"][0]
+        stored = tmp.read_file(f"{file}.gz", "rb")
+        assert stats["source_digests"] == stats["digests"]
+        assert stats["digests"]["sha256"] == hashlib.sha256(content).hexdigest()
+        assert stats["digests"]["crc32"] == f"{zlib.crc32(content):08x}"
+        assert stats["target_digests"]["sha256"] == hashlib.sha256(stored).hexdigest()
+        assert tmp.read_file(f"{file}.gz.sha256") == (
+            f"{hashlib.sha256(stored).hexdigest()}  {file}.gz\n"
+        )
+
+
+async def test_local_copy_recompress_in_process(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = os.urandom(1024) * 256
+        for i in range(3):
+            await filesystem_put.fn(
+                content=content,
+                filename=f"in/{i}.gz",
+                filesystem=lfs,
+                compression="gzip",
+            )
+
+        summary = await filesystem_copy.fn(
+            source_filename="in/{id}.gz",
+            source_filesystem=lfs,
+            source_compression="gzip",
+            target_filename="out/{id}.bz2",
+            target_filesystem=lfs,
+            target_compression="bz2",
+            datasource=[dict(id=i) for i in range(3)],
+            max_concurrency=2,
+            max_processes=2,
+            stage=False,
+            digests="sha256",
+            return_summary=True,
+        )
+
+        for i, stats in enumerate(summary["files"]):
+            assert stats["bytes"] == len(content)
+            assert stats["digests"]["sha256"] == hashlib.sha256(content).hexdigest()
+            assert bz2.decompress(tmp.read_file(f"out/{i}.bz2", "rb")) == content
+
+
+@pytest.mark.parametrize("archive_type", ["zip", "tar", "tar:gz"])
+async def test_memory_copy_into_archive(prefect_disable_logging, archive_type):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        for n in range(3):
+            mfs.write(f"in/{n}.gz", gzip.compress(f"content {n}".encode() * 100))
+
+        result = await filesystem_copy.fn(
+            source_filename="in/{n}.gz",
+            source_filesystem=mfs,
+            source_compression="gzip",
+            target_filename="files/{n}.txt",
+            target_filesystem=lfs,
+            datasource=[dict(n=n) for n in range(3)],
+            target_archive="bundle",
+            archive_type=archive_type,
+        )
+
+        names = ["files/0.txt", "files/1.txt", "files/2.txt"]
+        assert [o for _, o in result] == names
+        bundle = path.join(tmp.dir.name, "bundle")
+        if archive_type == "zip":
+            with zipfile.ZipFile(bundle) as archive:
+                assert archive.namelist() == names
+                assert archive.read("files/1.txt") == b"content 1" * 100
+        else:
+            with tarfile.open(bundle) as archive:
+                assert archive.getnames() == names
+                assert archive.extractfile("files/1.txt").read() == b"content 1" * 100
+
+
+@pytest.mark.parametrize(
+    "options", [dict(manifest="copy.manifest"), dict(skip_unchanged="size_mtime")]
+)
+async def test_archive_rejects_checkpoints(prefect_disable_logging, options):
+    mfs = MemoryBlock()
+    with pytest.raises(Exception, match="target_archive"):
+        await filesystem_copy.fn(
+            source_filename="in",
+            source_filesystem=mfs,
+            target_filesystem=mfs,
+            target_archive="bundle",
+            **options,
+        )
+
+
+async def test_memory_copy_fan_out(prefect_disable_logging):
+    with TempIt() as tmp:
+        source = MemoryBlock()
+        mfs = MemoryBlock()
+        lfs = tmp.get_local_filesystem()
+        content = b"my_content" * 4096
+        source.write("in.gz", gzip.compress(content))
+
+        summary = await filesystem_copy.fn(
+            source_filename="in.gz",
+            source_filesystem=source,
+            source_compression="gzip",
+            target_filesystem=[lfs, mfs, lfs],
+            target_filename=["plain", "copy.gz", "copy.zip"],
+            target_compression=[None, "gzip", dict(type="zip_ex", filename="in")],
+            block_size=1024,
+            read_ahead=2,
+            digests=["sha256"],
+            digest_sidecars=True,
+            return_summary=True,
+        )
+
+        assert [(f["target"], f["target_index"]) for f in summary["files"]] == [
+            ("plain", 0),
+            ("copy.gz", 1),
+            ("copy.zip", 2),
+        ]
+        assert all(f["bytes"] == len(content) for f in summary["files"])
+        assert summary["files"][0]["bytes_out"] == len(content)
+        assert tmp.read_file("plain", "rb") == content
+        assert gzip.decompress(mfs.read("copy.gz")) == content
+        with zipfile.ZipFile(path.join(tmp.dir.name, "copy.zip")) as archive:
+            assert archive.read("in") == content
+
+        payload = hashlib.sha256(content).hexdigest()
+        stored = hashlib.sha256(source.read("in.gz")).hexdigest()
+        plain, copy_gz, copy_zip = summary["files"]
+        assert plain["digests"] == {"sha256": payload}
+        assert plain["source_digests"] == {"sha256": stored}
+        assert plain["target_digests"] == {"sha256": payload}
+        assert copy_gz["target_digests"] == {
+            "sha256": hashlib.sha256(mfs.read("copy.gz")).hexdigest()
+        }
+        with open(path.join(tmp.dir.name, "copy.zip"), "rb") as fd:
+            zipped = hashlib.sha256(fd.read()).hexdigest()
+        assert copy_zip["target_digests"] == {"sha256": zipped}
+        assert tmp.read_file("plain.sha256") == f"{payload}  plain\n"
+
+        with pytest.raises(Exception, match="max_processes"):
+            await filesystem_copy.fn(
+                source_filename="in.gz",
+                source_filesystem=source,
+                target_filesystem=[lfs, mfs],
+                max_processes=2,
+            )
+
+
+@pytest.mark.parametrize("read_ahead", [0, 2])
+async def test_local_copy_retries_failed_reads(prefect_disable_logging, read_ahead):
+    with TempIt() as tmp:
+        content = os.urandom(64 * 1024)
+        file = tmp.get_filename()
+        with open(path.join(tmp.dir.name, file), "wb") as fd:
+            fd.write(content)
+        mfs = MemoryBlock()
+
+        summary = await filesystem_copy.fn(
+            source_filename=file,
+            source_filesystem=FlakyBlock(tmp.dir.name, failures=2, after=10000),
+            target_filesystem=mfs,
+            block_size=4096,
+            read_ahead=read_ahead,
+            stage=False,
+            retries=2,
+            retry_backoff=0,
+            return_summary=True,
+        )
+
+        assert summary["files"][0]["retries"] == 2
+        assert summary["totals"]["retries"] == 2
+        assert mfs.read(file) == content
+
+        with pytest.raises(ConnectionResetError):
+            await filesystem_copy.fn(
+                source_filename=file,
+                source_filesystem=FlakyBlock(tmp.dir.name, failures=3, after=10000),
+                target_filesystem=mfs,
+                stage=False,
+                retries=2,
+                retry_backoff=0,
+            )
+
+
+def test_retrying_file_delegates_seekable():
+    stored = io.BytesIO(b"stored bytes")
+    with RetryingFile(Unseekable(stored), lambda position: None, retries=1) as f:
+        assert not f.seekable()
+        assert f.read(6) == b"stored"
+    assert stored.closed
+    with RetryingFile(io.BytesIO(b"stored"), lambda position: None, retries=1) as f:
+        assert f.seekable()
+
+
+async def test_local_copy_retries_beneath_compression(prefect_disable_logging):
+    with TempIt() as tmp:
+        content = os.urandom(64 * 1024)
+        stored = gzip.compress(content)
+        with open(path.join(tmp.dir.name, "in.gz"), "wb") as fd:
+            fd.write(stored)
+        mfs = MemoryBlock()
+
+        state = dict(after=10000, dropped=False, read=0)
+        summary = await filesystem_copy.fn(
+            source_filename="in.gz",
+            source_compression="gzip",
+            source_filesystem=DroppingBlock(tmp.dir.name, state),
+            target_filename="out",
+            target_filesystem=mfs,
+            stage=False,
+            digests=["sha256"],
+            retries=1,
+            retry_backoff=0,
+            retry_on=[ConnectionDropped],
+            return_summary=True,
+        )
+
+        copied = summary["files"][0]
+        assert copied["retries"] == 1
+        assert mfs.read("out") == content
+        # Resumed at the stored byte that failed, on a new connection
+        assert state["read"] == len(stored)
+        assert copied["source_digests"] == {
+            "sha256": hashlib.sha256(stored).hexdigest()
+        }
+
+        with pytest.raises(ConnectionDropped):
+            await filesystem_copy.fn(
+                source_filename="in.gz",
+                source_compression="gzip",
+                source_filesystem=DroppingBlock(
+                    tmp.dir.name, dict(after=10000, dropped=False, read=0)
+                ),
+                target_filename="out",
+                target_filesystem=mfs,
+                stage=False,
+                retries=1,
+                retry_backoff=0,
+            )
+
+
+def test_transfer_plan():
+    plan = TransferPlan(list("abcde"), [1, 8, 2, 3, 5], 2, "bin_pack")
+    assert plan.order == [1, 4, 3, 2, 0]
+    assert plan.slots == [[1, 2], [4, 3, 0]]
+    assert plan.loads == [10, 9]
+
+
+@pytest.mark.parametrize("schedule", ["largest_first", "bin_pack"])
+async def test_memory_copy_schedule(prefect_disable_logging, schedule):
+    with TempIt() as tmp:
+        mfs = MemoryBlock()
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        sizes = [10, 5000, 20, 3000, 400]
+        for n, size in enumerate(sizes):
+            mfs.write(f"in/{n}", b"x" * size)
+
+        summary = await filesystem_copy.fn(
+            source_filename="in/{n}",
+            source_filesystem=mfs,
+            target_filename="out/{n}",
+            target_filesystem=lfs,
+            target_compression="gzip",
+            datasource=[dict(n=n) for n in range(len(sizes))],
+            max_concurrency=2,
+            schedule=schedule,
+            return_summary=True,
+        )
+
+        assert [f["source"] for f in summary["files"]] == [f"in/{n}" for n in range(5)]
+        assert [f["bytes"] for f in summary["files"]] == sizes
+        assert summary["totals"]["ideal_makespan"] > 0
+
+
+async def test_local_copy_rate_limit(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        for n in range(3):
+            with lfs.open(f"in/{n}", "wb") as fd:
+                fd.write(b"x" * 10000)
+        set_rate_limit(lfs, RateLimit(bytes_per_second=100000, burst=0.1))
+        try:
+            assert lfs.rate_limit() is not None
+            assert "rate_limit" not in lfs.dict()
+
+            started = time.monotonic()
+            await filesystem_copy.fn(
+                source_filename="in/{n}",
+                source_filesystem=lfs,
+                target_filename="out/{n}",
+                target_filesystem=lfs,
+                datasource=[dict(n=n) for n in range(3)],
+                max_concurrency=3,
+                block_size=1000,
+            )
+            # 60000 bytes read and written, less the 10000 byte burst
+            assert time.monotonic() - started >= 0.45
+            with lfs.open("out/2", "rb") as fd:
+                assert fd.read() == b"x" * 10000
+        finally:
+            set_rate_limit(lfs, None)
+        assert lfs.rate_limit() is None
+
+
+async def test_rate_limit_counts_stored_bytes(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = b"x" * 1024 * 1024
+        with lfs.open("in.gz", "wb", compression="gzip") as fd:
+            fd.write(content)
+        mfs = MemoryBlock()
+        set_rate_limit(lfs, RateLimit(bytes_per_second=20000, burst=0))
+        try:
+            started = time.monotonic()
+            await filesystem_copy.fn(
+                source_filename="in.gz",
+                source_compression="gzip",
+                source_filesystem=lfs,
+                target_filename="out",
+                target_filesystem=mfs,
+                stage=False,
+            )
+            # A couple of kilobytes are stored, the decoded megabyte would take
+            # over 50 seconds
+            assert time.monotonic() - started < 5
+        finally:
+            set_rate_limit(lfs, None)
+        assert mfs.read("out") == content
+
+
+async def test_rate_limit_archives(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        for n in range(3):
+            with lfs.open(f"in/{n}", "wb") as fd:
+                fd.write(os.urandom(10000))
+        mfs = MemoryBlock()
+        set_rate_limit(mfs, RateLimit(bytes_per_second=100000, burst=0))
+        try:
+            started = time.monotonic()
+            await filesystem_copy.fn(
+                source_filename="{path}",
+                source_glob="in/*",
+                source_filesystem=lfs,
+                target_filesystem=mfs,
+                target_archive="out.zip",
+            )
+            # Over 30000 bytes written into the archive
+            assert time.monotonic() - started >= 0.25
+
+            started = time.monotonic()
+            with mfs.open_archive("out.zip") as archive:
+                with archive.open("in/0", "rb") as fo:
+                    assert len(fo.read()) == 10000
+            # The member is read through the limit
+            assert time.monotonic() - started >= 0.08
+
+            started = time.monotonic()
+            await filesystem_copy.fn(
+                source_filename="*",
+                source_filesystem=mfs,
+                target_filesystem=lfs,
+                target_filename="out/{path}",
+                source_archive="out.zip",
+            )
+            # The whole archive is read
+            assert time.monotonic() - started >= 0.25
+        finally:
+            set_rate_limit(mfs, None)
+        with lfs.open("in/2", "rb") as fd:
+            with lfs.open("out/in/2", "rb") as fo:
+                assert fo.read() == fd.read()
+
+
+async def test_rate_limit_wrapped_block(prefect_disable_logging):
+    block = RemoteFileSystem(basepath=f"memory://{uuid.uuid1()}")
+    with ensure_abstract(block).open("in", "wb") as fd:
+        fd.write(os.urandom(30000))
+    set_rate_limit(block, RateLimit(bytes_per_second=100000, burst=0))
+    try:
+        assert ensure_abstract(block).rate_limit() is not None
+        started = time.monotonic()
+        await filesystem_copy.fn(
+            source_filename="in",
+            source_filesystem=block,
+            target_filename="out",
+            target_filesystem=MemoryBlock(),
+            stage=False,
+            block_size=1000,
+        )
+        # 30000 bytes read through the limit of the wrapped block
+        assert time.monotonic() - started >= 0.25
+    finally:
+        set_rate_limit(block, None)
+    assert ensure_abstract(block).rate_limit() is None
+
+
+async def test_rate_limit_by_type(prefect_disable_logging):
+    set_rate_limit(MemoryBlock, RateLimit(opens_per_second=20, burst=0))
+    try:
+        mfs = MemoryBlock()
+        started = time.monotonic()
+        for n in range(5):
+            await filesystem_put.fn(b"data", f"rate/{n}", mfs)
+        assert await filesystem_get.fn("rate/4", mfs, encoding=None) == b"data"
+        # The first open is free, the other five wait for 1/20s each
+        assert time.monotonic() - started >= 0.2
+    finally:
+        set_rate_limit(MemoryBlock, None)
+
+
+async def test_rate_limit_json_put(prefect_disable_logging):
+    mfs = MemoryBlock()
+    set_rate_limit(mfs, RateLimit(bytes_per_second=1000, burst=1))
+    try:
+        await filesystem_put.fn({"rows": [1, 2, 3]}, "rate.json", mfs)
+        assert await filesystem_get.fn("rate.json", mfs, transform="json") == {
+            "rows": [1, 2, 3]
+        }
+    finally:
+        set_rate_limit(mfs, None)
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        dict(type="zstd"),
+        dict(type="zstd", level=19, threads=2, long=True),
+    ],
+)
+async def test_zstd(prefect_disable_logging, compression):
+    pytest.importorskip("zstandard")
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = [dict(n=n, name=f"row {n}") for n in range(1000)]
+        await filesystem_put.fn(content, "in.json.zst", lfs, compression=compression)
+        assert path.getsize(path.join(tmp.dir.name, "in.json.zst")) < len(
+            json.dumps(content)
+        )
+        assert (
+            await filesystem_get.fn(
+                "in.json.zst", lfs, compression="zstd", transform="json"
+            )
+            == content
+        )
+
+        await filesystem_copy.fn(
+            source_filename="in.json.zst",
+            source_filesystem=lfs,
+            source_compression="zstd",
+            target_filename="out.json.gz",
+            target_filesystem=lfs,
+            target_compression="gzip",
+        )
+        with gzip.open(path.join(tmp.dir.name, "out.json.gz")) as fd:
+            assert json.load(fd) == content
+
+        await filesystem_copy.fn(
+            source_filename="out.json.gz",
+            source_filesystem=lfs,
+            source_compression="gzip",
+            target_filename="copy.json.zst",
+            target_filesystem=lfs,
+            target_compression=compression,
+        )
+        assert (
+            await filesystem_get.fn(
+                "copy.json.zst", lfs, compression=compression, transform="json"
+            )
+            == content
+        )
+
+
+async def test_parallel_gzip(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = b"".join(b"%d," % n for n in range(100000))
+        compression = dict(type="pigz", level=1, block_size=10000, threads=2)
+        await filesystem_put.fn(content, "out.gz", lfs, compression=compression)
+
+        with open(path.join(tmp.dir.name, "out.gz"), "rb") as fd:
+            stored = fd.read()
+        assert gzip.decompress(stored) == content
+        members = 0
+        while stored:
+            z = zlib.decompressobj(31)
+            z.decompress(stored)
+            stored = z.unused_data
+            members += 1
+        assert members == -(-len(content) // 10000)
+
+        assert await filesystem_get.fn("out.gz", lfs, "pigz", encoding=None) == content
+        await filesystem_put.fn("", "empty.gz", lfs, compression="pigz")
+        assert await filesystem_get.fn("empty.gz", lfs, "gzip") == ""
+
+
+def test_zip_archive_handle():
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        with lfs.open_archive("out.zip", "w") as archive:
+            for n in range(100):
+                archive.write(f"{n}.txt", f"member {n}")
+            with archive.open("last.txt", "wt") as fo:
+                fo.write("last")
+
+        with zipfile.ZipFile(path.join(tmp.dir.name, "out.zip")) as zf:
+            assert zf.testzip() is None
+
+        with lfs.open_archive("out.zip") as archive:
+            assert archive.namelist()[:2] == ["0.txt", "1.txt"]
+            assert len(archive.members()) == 101
+            assert archive.members()[-1]["name"] == "last.txt"
+            assert archive.members()[-1]["size"] == 4
+            for n in (99, 3, 42):
+                with archive.open(f"{n}.txt", "rt", encoding="utf-8") as fo:
+                    assert fo.read() == f"member {n}"
+
+
+class CountingFile:
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        _bytes = self.f.read(size)
+        self.bytes_read += len(_bytes)
+        return _bytes
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+async def test_seekable_gzip(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = b"".join(b"%08d" % n for n in range(100000))
+        compression = dict(type="seekable_gzip", block_size=1000)
+        await filesystem_put.fn(content, "out.gz", lfs, compression=compression)
+        with open(path.join(tmp.dir.name, "out.gz"), "rb") as fd:
+            stored = fd.read()
+        assert gzip.decompress(stored) == content
+
+        counted = []
+
+        def wrap(f):
+            counted.append(CountingFile(f))
+            return counted[-1]
+
+        with lfs.open("out.gz", "rb", compression="seekable_gzip", wrap=wrap) as fd:
+            reading_index = counted[0].bytes_read
+            assert fd.seek(400000) == 400000
+            assert fd.read(24) == b"0005000000050001" + b"00050002"
+            fd.seek(-8, 2)
+            assert fd.read() == b"00099999"
+            assert fd.tell() == len(content)
+        # Only the index and the blocks holding the ranges are read
+        assert counted[0].bytes_read - reading_index < 4 * len(stored) / 800
+
+        assert await filesystem_get.fn("out.gz", lfs, "seekable_gzip") == (
+            content.decode()
+        )
+        await filesystem_put.fn(content, "plain.gz", lfs, compression="gzip")
+        assert await filesystem_get.fn("plain.gz", lfs, "seekable_gzip") == (
+            content.decode()
+        )
+
+
+async def test_parallel_gunzip(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        content = b"".join(b"%d," % n for n in range(100000))
+        compression = dict(type="pigz", block_size=10000, threads=2, read_ahead=3)
+        await filesystem_put.fn(content, "in.gz", lfs, compression=compression)
+        with lfs.open("in.gz", "ab") as fd:
+            # A member without a size is read sequentially, as are the rest
+            fd.write(gzip.compress(b"tail") + gzip.compress(b"end"))
+
+        with lfs.open("in.gz", "rb", compression=compression) as fd:
+            chunks = []
+            while True:
+                chunk = fd.read(3000)
+                assert len(fd._pending) <= 3
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        assert b"".join(chunks) == content + b"tailend"
+
+        await filesystem_copy.fn(
+            source_filename="in.gz",
+            source_filesystem=lfs,
+            source_compression=compression,
+            target_filename="out.txt",
+            target_filesystem=lfs,
+        )
+        assert await filesystem_get.fn("out.txt", lfs, encoding=None) == (
+            content + b"tailend"
+        )
+
+
+async def test_unpack_streamed_zip(prefect_disable_logging):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        members = {f"data/{n}.csv": b"%d,%d\n" % (n, n) * 1000 * n for n in range(4)}
+        with lfs.open("in.zip", "wb") as fd:
+            # Written as a stream, so members are followed by data descriptors
+            with zipfile.ZipFile(Unseekable(fd), "w", zipfile.ZIP_DEFLATED) as zf:
+                for name, data in members.items():
+                    zf.writestr(name, data)
+                zf.writestr("readme.txt", b"skipped")
+
+        assert (
+            await filesystem_get.fn(
+                "in.zip",
+                lfs,
+                dict(type="zip_ex", filename="data/2.csv", stream=True),
+                encoding=None,
+            )
+            == members["data/2.csv"]
+        )
+
+        summary = await filesystem_copy.fn(
+            source_filename="data/*.csv",
+            source_filesystem=lfs,
+            source_archive="in.zip",
+            target_filename="out/{name}.gz",
+            target_filesystem=lfs,
+            target_compression="gzip",
+            return_summary=True,
+        )
+        assert [f["target"] for f in summary["files"]] == [
+            f"out/{n}.csv.gz" for n in range(4)
+        ]
+        assert summary["files"][3]["bytes"] == len(members["data/3.csv"])
+        for name, data in members.items():
+            with gzip.open(path.join(tmp.dir.name, "out", name[5:] + ".gz")) as fd:
+                assert fd.read() == data
+
+
+@pytest.mark.parametrize("stage", [True, False])
+async def test_local_copy_infer_recompresses(prefect_disable_logging, stage):
+    with TempIt() as tmp:
+        lfs = AbstractLocalFileSystem(root_path=tmp.dir.name, auto_mkdir=True)
+        with lfs.open("a.gz", "wb", compression="gzip") as fd:
+            fd.write(b"inferred" * 1000)
+
+        await filesystem_copy.fn(
+            source_filename="a.gz",
+            source_filesystem=lfs,
+            source_compression="infer",
+            target_filename="b.bz2",
+            target_filesystem=lfs,
+            target_compression="infer",
+            stage=stage,
+        )
+        with bz2.open(path.join(tmp.dir.name, "b.bz2")) as fd:
+            assert fd.read() == b"inferred" * 1000